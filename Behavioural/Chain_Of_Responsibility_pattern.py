@@ -48,23 +48,25 @@ class RequestHandler:
         return self.request.payload
             
 
-req = Request(None, "ADMIN", 2, '{ "data": 123 }')
-req2 = Request("john_doe", "User", 4, '{ "data": 123 }')
-req3 = Request("john_doe", "ADMIN", 3, '{ "data": 123 }')
-req4 = Request("john_doe", "ADMIN", 4, '{ "data": 123 }')
-req5 = Request("john_doe", "ADMIN", 2, '')
-
-processor = RequestHandler(req)
-processor2 = RequestHandler(req2)
-processor3 = RequestHandler(req3)
-processor4 = RequestHandler(req4)
-processor5 = RequestHandler(req5)
-
-# processor.handle()
-# processor2.handle()
-# processor3.handle()
-# processor4.handle()
-# processor5.handle()
+if __name__ == "__main__":
+
+    req = Request(None, "ADMIN", 2, '{ "data": 123 }')
+    req2 = Request("john_doe", "User", 4, '{ "data": 123 }')
+    req3 = Request("john_doe", "ADMIN", 3, '{ "data": 123 }')
+    req4 = Request("john_doe", "ADMIN", 4, '{ "data": 123 }')
+    req5 = Request("john_doe", "ADMIN", 2, '')
+
+    processor = RequestHandler(req)
+    processor2 = RequestHandler(req2)
+    processor3 = RequestHandler(req3)
+    processor4 = RequestHandler(req4)
+    processor5 = RequestHandler(req5)
+
+    # processor.handle()
+    # processor2.handle()
+    # processor3.handle()
+    # processor4.handle()
+    # processor5.handle()
 
 # ============== Problems With This Design ==============
 """
@@ -94,52 +96,53 @@ class BaseRequestHandler(RequestHandler):
         self.next_handler = handler
 
     @abstractmethod
-    def handle(self,request):
+    def check(self,request):
+        """ Returns why the request is rejected, or None to pass it on. """
         pass
 
+    def handle(self,request):
+
+        reason = self.check(request)
+        if reason is not None:
+            print(reason)
+            return
+
+        if self.next_handler is None:
+            print("Passed All Validations !")
+            return
+
+        self.next_process(request)
+
     def next_process(self,request):
         self.next_handler.handle(request)
 
 
 class Authentication(BaseRequestHandler):
     
-    def handle(self,request):
+    def check(self,request):
         if request.user is None:
-            print(f"User {request.user} is not Authenticated")
-            return
-
-        self.next_process(request)
+            return f"User {request.user} is not Authenticated"
 
 class Authorization(BaseRequestHandler):
 
-    def handle(self, request):
+    def check(self, request):
 
-        if request.user_role.lower() != "ADMIN".lower():
-            print(f"User {request.user} is not Authorized")
-            return
-
-        self.next_process(request)
+        if request.user_role.lower() != "admin":
+            return f"User {request.user} is not Authorized"
 
 class RateLimitig(BaseRequestHandler):
 
-    def handle(self,request):
+    def check(self,request):
 
         if request.request_cnt >= 4:
-            print(f"User {request.request_cnt}'s Rate Limiting 3 Exceeded")
-            return 
-        
-        self.next_process(request)
+            return f"User {request.request_cnt}'s Rate Limiting 3 Exceeded"
 
 class Validation(BaseRequestHandler):
 
-    def handle(self, request):
+    def check(self, request):
         
         if not request.payload:
-
-            print(f"Validation Failed {request.user}")
-            return 
-        
-        print("Passed All Validations !")
+            return f"Validation Failed {request.user}"
 
 
 class RequestHandlerV2():
@@ -157,12 +160,188 @@ class RequestHandlerV2():
 
         auth.handle(request)
 
-req_handle = RequestHandlerV2()
-req_handle.handle(req)
-req_handle.handle(req2)
-req_handle.handle(req3)
-req_handle.handle(req4)
-req_handle.handle(req5)
+if __name__ == "__main__":
+
+    req_handle = RequestHandlerV2()
+    req_handle.handle(req)
+    req_handle.handle(req2)
+    req_handle.handle(req3)
+    req_handle.handle(req4)
+    req_handle.handle(req5)
+
+#  ============== Compiled Chain ==============
+"""
+RequestHandlerV2 builds and links four handlers for every request, then recurses through
+next_process. The chain never changes between requests, so ChainBuilder compiles it once into
+a tuple of (handler name, check) pairs and run() walks it in a plain loop. run() returns a
+ChainResult instead of printing, so callers decide what to do with a rejection.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ChainResult:
+
+    passed: bool
+    handler: str = None      # name of the handler that rejected the request
+    reason: str = None
+
+PASSED = ChainResult(True)
+
+
+class CompiledChain:
+
+    __slots__ = ("stages",)
+
+    def __init__(self,stages):
+        object.__setattr__(self,"stages",tuple(stages))
+
+    def __setattr__(self,name,value):
+        raise AttributeError("CompiledChain is immutable, build a new one with ChainBuilder")
+
+    def run(self,request):
+
+        for name,check in self.stages:
+            reason = check(request)
+            if reason is not None:
+                return ChainResult(False,name,reason)
+        return PASSED
+
+    def __repr__(self):
+        return f"CompiledChain({' -> '.join(name for name,_ in self.stages)})"
+
+
+class ChainBuilder:
+
+    def __init__(self):
+        self.handlers = []
+
+    def add(self,handler):
+        self.handlers.append(handler)
+        return self
+
+    def build(self):
+        return CompiledChain((type(handler).__name__,handler.check) for handler in self.handlers)
+
+
+class RequestHandlerV3:
+
+    chain = ChainBuilder().add(Authentication()).add(Authorization()).add(RateLimitig()).add(Validation()).build()
+
+    def handle(self,request):
+        return self.chain.run(request)
+
+if __name__ == "__main__":
+
+    handler = RequestHandlerV3()
+    for request in (req,req2,req3,req4,req5):
+        print(handler.handle(request))
+
+    # Benchmark: 100k requests, a fifth of them rejected at each stage
+    import contextlib
+    import io
+    import time
+
+    requests = [(req,req2,req3,req4,req5)[i % 5] for i in range(100_000)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for request in requests:
+            req_handle.handle(request)
+        linked = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for request in requests:
+        handler.handle(request)
+    compiled = time.perf_counter() - start
+
+    print(f"100k requests  RequestHandlerV2: {len(requests) / linked:,.0f} req/s  "
+          f"compiled chain: {len(requests) / compiled:,.0f} req/s")
+
+#  ============== Rate Limiting with GCRA ==============
+"""
+RateLimitig trusts request_cnt, which the client sends. GCRARateLimiter keeps the state itself,
+using the Generic Cell Rate Algorithm: per user it stores a single float, the theoretical
+arrival time (TAT) of the next request. A request is allowed if it would not put the TAT more
+than the burst tolerance ahead of now. That is a sliding window with no per-request history:
+O(1) time and memory per user.
+
+A user whose TAT has fallen behind the clock looks exactly like a user never seen, so that entry
+can be dropped. Entries are kept least recently used first and idle ones are evicted from the
+front as requests come in. max_users is a hard cap on top of that. Evicting a user who is still
+active only forgets their recent usage, so the cap can let a user through early but never blocks them wrongly.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class GCRARateLimiter(BaseRequestHandler):
+
+    def __init__(self,rate,burst=1,max_users=None,clock=time.monotonic):
+
+        """ rate: requests per second per user; burst: requests allowed back to back. """
+
+        super().__init__()
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.max_users = max_users
+        self.clock = clock
+        self._tat = OrderedDict()       # user -> theoretical arrival time, least recently seen first
+        self._lock = threading.Lock()
+
+    def check(self,request):
+
+        user = request.user
+        with self._lock:
+            now = self.clock()
+            tat = self._tat.get(user)
+            if tat is None or tat < now:
+                tat = now
+            else:
+                self._tat.move_to_end(user)
+
+            if tat - now > self.tolerance:
+                retry_after = tat - now - self.tolerance
+                return f"User {user}'s rate limit exceeded, retry in {retry_after:.3f}s"
+
+            self._tat[user] = tat + self.interval
+            self._evict(now)
+
+    def _evict(self,now):
+
+        # Amortized O(1): every entry is evicted at most once per time it is created
+        tats = self._tat
+        while len(tats) > 1:
+            user,tat = next(iter(tats.items()))
+            if tat > now and (self.max_users is None or len(tats) <= self.max_users):
+                break
+            del tats[user]
+
+    def __len__(self):
+        return len(self._tat)
+
+if __name__ == "__main__":
+
+    limited = ChainBuilder().add(Authentication()).add(Authorization()) \
+                            .add(GCRARateLimiter(rate=2,burst=3)).add(Validation()).build()
+    for i in range(5):
+        print(limited.run(Request("john_doe","ADMIN",0,'{ "data": 123 }')))
+
+    # A million users, one request each, over ten simulated minutes: memory stays bounded
+    clock = [0.0]
+    limiter = GCRARateLimiter(rate=10,burst=20,max_users=500_000,clock=lambda: clock[0])
+    start = time.perf_counter()
+    largest = 0
+    for i in range(1_000_000):
+        clock[0] = i * 0.0006
+        limiter.check(Request(f"user{i}","ADMIN",0,"x"))
+        largest = max(largest,len(limiter))
+    elapsed = time.perf_counter() - start
+    print(f"1M users: {elapsed / 1_000_000 * 1e6:.2f} us per check, at most {largest} users tracked, "
+          f"{len(limiter)} tracked at the end")
 
 # =============== ATM Cash Dispenser =============
 class CashRequest:
@@ -220,21 +399,23 @@ class TenDollarHandler(BaseCashHandler):
         super().__init__(10)
 
 # Usage
-hundreds = HundredDollarHandler()
-fifties = FiftyDollarHandler()
-twenties = TwentyDollarHandler()
-tens = TenDollarHandler()
-
-hundreds.set_next(fifties)
-fifties.set_next(twenties)
-twenties.set_next(tens)
-
-print("--- Withdrawing $380 ---")
-request1 = CashRequest(380)
-hundreds.dispense(request1)
-print(f"Remaining: ${request1.amount}")
-
-print("\n--- Withdrawing $275 ---")
-request2 = CashRequest(275)
-hundreds.dispense(request2)
-print(f"Remaining: ${request2.amount}")
\ No newline at end of file
+if __name__ == "__main__":
+
+    hundreds = HundredDollarHandler()
+    fifties = FiftyDollarHandler()
+    twenties = TwentyDollarHandler()
+    tens = TenDollarHandler()
+
+    hundreds.set_next(fifties)
+    fifties.set_next(twenties)
+    twenties.set_next(tens)
+
+    print("--- Withdrawing $380 ---")
+    request1 = CashRequest(380)
+    hundreds.dispense(request1)
+    print(f"Remaining: ${request1.amount}")
+
+    print("\n--- Withdrawing $275 ---")
+    request2 = CashRequest(275)
+    hundreds.dispense(request2)
+    print(f"Remaining: ${request2.amount}")
@@ -0,0 +1,352 @@
+# Real-World Usage of the Chain of Responsibility: async handlers backed by an identity service
+
+"""
+In production, Authentication and Authorization (Chain_Of_Responsibility_pattern.py) don't check
+fields on the request. They ask a token-introspection service, over the network:
+
+    . AsyncBaseRequestHandler is the asyncio counterpart of BaseRequestHandler: check() is a
+      coroutine and handle() returns a ChainResult. AsyncAdapter wraps the synchronous
+      handlers (Validation, GCRARateLimiter, ...), so they can run in the same chain.
+    . AsyncAuthentication / AsyncAuthorization call the identity service through
+      IdentityClient, a small keep-alive HTTP/1.1 client.
+    . DecisionCache holds their decisions keyed by (token, role, resource), with separate TTLs for
+      allowed and denied decisions, bounded to max_entries (least recently used go first).
+      Concurrent misses for the same key share one call to the service. Errors are not cached.
+
+A cached "allowed" outlives a revoked token by up to ttl seconds. Keep ttl short where that matters.
+"""
+
+import asyncio
+import json
+import time
+from abc import ABC,abstractmethod
+from collections import OrderedDict,deque
+
+from Chain_Of_Responsibility_pattern import PASSED,ChainResult,Request
+
+
+class ApiRequest(Request):
+
+    def __init__(self,token,user_role,resource,payload,request_cnt=0):
+
+        super().__init__(None,user_role,request_cnt,payload)
+        self.token = token
+        self.resource = resource
+
+
+class IdentityServiceError(Exception):
+    pass
+
+
+class DecisionCache:
+
+    def __init__(self,ttl=30.0,negative_ttl=5.0,max_entries=100_000,clock=time.monotonic):
+
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()   # key -> (expires, decision), least recently used first
+        self._loading = {}              # key -> asyncio.Task shared by concurrent misses
+
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.evictions = 0
+
+    async def get(self,key,load):
+
+        """ load() is a coroutine function returning a decision (allowed, detail). """
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        loading = self._loading.get(key)
+        if loading is not None:
+            self.collapsed += 1
+        else:
+            self.misses += 1
+            # load() runs in its own task: a caller that is cancelled stops waiting, the load goes on for the rest
+            loading = self._loading[key] = asyncio.ensure_future(load())
+            loading.add_done_callback(lambda task: self._loaded(key,task))
+        return await asyncio.shield(loading)
+
+    def _loaded(self,key,task):
+
+        del self._loading[key]
+        # Always look at the exception, even when every caller was cancelled and nobody else will
+        if not task.cancelled() and task.exception() is None:
+            self._store(key,task.result())
+
+    def _store(self,key,decision):
+
+        ttl = self.ttl if decision[0] else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (self.clock() + ttl,decision)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {"entries": len(self._entries),"hits": self.hits,"misses": self.misses,
+                "collapsed": self.collapsed,"evictions": self.evictions}
+
+
+class IdentityClient:
+
+    """ POSTs JSON to the identity service over pooled keep-alive connections. """
+
+    def __init__(self,host,port,max_connections=20,timeout=2.0):
+
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle = deque()
+        self.calls = 0
+
+    async def post(self,path,payload):
+
+        async with self._slots:
+            self.calls += 1
+            return await asyncio.wait_for(self._post(path,json.dumps(payload).encode()),self.timeout)
+
+    async def _post(self,path,body):
+
+        reused = bool(self._idle)
+        reader,writer = self._idle.popleft() if reused else await asyncio.open_connection(self.host,self.port)
+        try:
+            writer.write(f"POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("Identity service closed the connection")
+            status = int(status_line.split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n",b"\n",b""):
+                    break
+                name,value = line.decode("latin-1").split(":",1)
+                headers[name.strip().lower()] = value.strip()
+            data = await reader.readexactly(int(headers.get("content-length",0)))
+        except (ConnectionError,asyncio.IncompleteReadError):
+            writer.close()
+            if reused:
+                return await self._post(path,body)      # stale keep-alive connection, retry on a fresh one
+            raise
+        except BaseException:
+            writer.close()
+            raise
+
+        if headers.get("connection","").lower() == "close":
+            writer.close()
+        else:
+            self._idle.append((reader,writer))
+
+        if status != 200:
+            raise IdentityServiceError(f"{path} answered {status}")
+        return json.loads(data)
+
+    async def close(self):
+
+        while self._idle:
+            _,writer = self._idle.popleft()
+            writer.close()
+            await writer.wait_closed()
+
+
+class AsyncBaseRequestHandler(ABC):
+
+    def __init__(self):
+        self.next_handler = None
+
+    def set_next_handler(self,handler):
+        self.next_handler = handler
+        return handler
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    @abstractmethod
+    async def check(self,request):
+        """ Returns why the request is rejected, or None to pass it on. """
+        pass
+
+    async def handle(self,request):
+
+        handler = self
+        while handler is not None:
+            reason = await handler.check(request)
+            if reason is not None:
+                return ChainResult(False,handler.name,reason)
+            handler = handler.next_handler
+        return PASSED
+
+
+class AsyncAdapter(AsyncBaseRequestHandler):
+
+    """ Runs a synchronous handler's check() inside an async chain. """
+
+    def __init__(self,handler):
+        super().__init__()
+        self.handler = handler
+
+    @property
+    def name(self):
+        return type(self.handler).__name__
+
+    async def check(self,request):
+        return self.handler.check(request)
+
+
+class AsyncAuthentication(AsyncBaseRequestHandler):
+
+    def __init__(self,identity,cache=None):
+
+        super().__init__()
+        self.identity = identity
+        self.cache = cache
+
+    async def check(self,request):
+
+        async def introspect():
+            answer = await self.identity.post("/introspect",{"token": request.token})
+            return (answer["active"],answer.get("sub"))
+
+        # Whether a token is valid doesn't depend on the role or resource asked for
+        key = (request.token,None,None)
+        active,user = await (self.cache.get(key,introspect) if self.cache else introspect())
+        if not active:
+            return "Token is not active"
+        request.user = user
+
+class AsyncAuthorization(AsyncBaseRequestHandler):
+
+    def __init__(self,identity,cache=None):
+
+        super().__init__()
+        self.identity = identity
+        self.cache = cache
+
+    async def check(self,request):
+
+        async def authorize():
+            answer = await self.identity.post("/authorize",{"token": request.token,"role": request.user_role,
+                                                             "resource": request.resource})
+            return (answer["allowed"],None)
+
+        key = (request.token,request.user_role,request.resource)
+        allowed,_ = await (self.cache.get(key,authorize) if self.cache else authorize())
+        if not allowed:
+            return f"User {request.user} may not access {request.resource} as {request.user_role}"
+
+
+if __name__ == "__main__":
+
+    import random
+
+    from Chain_Of_Responsibility_pattern import GCRARateLimiter,Validation
+
+    # Stand-in identity service: tokens "token-<n>" belong to user<n>; odd n are admins; token-0 is revoked
+    SERVICE_LATENCY = 0.02
+
+    async def identity_service(reader,writer):
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n",b"\n",b""):
+                        break
+                    name,value = line.decode("latin-1").split(":",1)
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                payload = json.loads(await reader.readexactly(length))
+                path = request_line.split()[1].decode()
+
+                await asyncio.sleep(SERVICE_LATENCY)
+                number = int(payload["token"].rsplit("-",1)[1])
+                if path == "/introspect":
+                    answer = {"active": number != 0,"sub": f"user{number}"}
+                else:
+                    admin = number % 2 == 1
+                    answer = {"allowed": payload["role"] == "ADMIN" and admin or payload["resource"].startswith("/public")}
+
+                body = json.dumps(answer).encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\n\r\n%s" % (len(body),body))
+                await writer.drain()
+        except (ConnectionError,asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def build_chain(identity,cached):
+
+        chain = AsyncAuthentication(identity,DecisionCache(max_entries=10_000) if cached else None)
+        chain.set_next_handler(AsyncAuthorization(identity,DecisionCache(max_entries=10_000) if cached else None)) \
+             .set_next_handler(AsyncAdapter(GCRARateLimiter(rate=1000,burst=1000))) \
+             .set_next_handler(AsyncAdapter(Validation()))
+        return chain
+
+    async def run(chain,requests,concurrency=100):
+
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(request):
+            async with slots:
+                return await chain.handle(request)
+
+        return await asyncio.gather(*(one(request) for request in requests))
+
+    async def main():
+
+        server = await asyncio.start_server(identity_service,"127.0.0.1",0)
+        port = server.sockets[0].getsockname()[1]
+
+        identity = IdentityClient("127.0.0.1",port)
+        chain = build_chain(identity,cached=True)
+        for request in (ApiRequest("token-0","ADMIN","/admin","{}"),
+                        ApiRequest("token-2","USER","/admin","{}"),
+                        ApiRequest("token-3","ADMIN","/admin",""),
+                        ApiRequest("token-3","ADMIN","/admin","{}")):
+            print(await chain.handle(request))
+
+        # Benchmark: 5000 requests from 50 users over 3 resources, with and without the decision cache
+        rng = random.Random(7)
+        requests = [ApiRequest(f"token-{rng.randrange(1,51)}",rng.choice(("ADMIN","USER")),
+                               rng.choice(("/admin","/reports","/public/docs")),"{}") for _ in range(5000)]
+
+        print(f"\n{'':<10} {'req/s':>8} {'passed':>7} {'identity calls':>15}")
+        for cached in (False,True):
+            identity = IdentityClient("127.0.0.1",port)
+            chain = build_chain(identity,cached)
+            start = time.perf_counter()
+            results = await run(chain,[ApiRequest(r.token,r.user_role,r.resource,r.payload) for r in requests])
+            elapsed = time.perf_counter() - start
+            await identity.close()
+            print(f"{'cached' if cached else 'uncached':<10} {len(requests) / elapsed:>8.0f} "
+                  f"{sum(result.passed for result in results):>7} {identity.calls:>15}")
+
+        print("authentication cache:",chain.cache.stats())
+        print("authorization cache:",chain.next_handler.cache.stats())
+
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
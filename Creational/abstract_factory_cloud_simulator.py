@@ -0,0 +1,181 @@
+# Real-World Usage of the Abstract Factory: an in-process cloud to test and benchmark provisioning offline
+
+"""
+SimulatedCloud stands in for the AWS and Azure APIs that the CloudFactory products
+(abstract_factory_patten.py) call through call_cloud(provider, operation):
+
+    . Every call sleeps for a latency drawn from a configurable distribution, per operation
+      or per provider. time_scale shrinks or stretches every latency.
+    . A configurable share of calls fails. Transient failures (503) raise
+      TransientProvisioningError, which the provisioning engine retries; fatal ones raise
+      SimulatedCloudError.
+    . Per-provider token-bucket rate limits answer excess calls with a throttling
+      TransientProvisioningError (429), as real APIs do.
+    . Draws are seeded per (provider, operation, call number), so a given seed always
+      produces the same latencies and failures for the n-th call of each operation, however
+      the threads interleave. Throttling follows the real clock, so leave rate_limits unset
+      when a run has to be exactly repeatable.
+
+Install it with `with SimulatedCloud(...).installed(): ...`.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import abstract_factory_patten
+from abstract_factory_provisioning import TransientProvisioningError
+
+
+class SimulatedCloudError(Exception):
+    pass
+
+
+## Latency distributions: callables taking a random.Random and returning seconds
+
+def constant(seconds):
+    return lambda rng: seconds
+
+def uniform(low,high):
+    return lambda rng: rng.uniform(low,high)
+
+def lognormal(median,sigma=0.5):
+    # Long right tail, like real control-plane APIs
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu,sigma)
+
+
+class SimulatedCloud:
+
+    def __init__(self,seed=0,latency=constant(0.01),latencies=None,failure_rate=0.0,failure_rates=None,
+                 fatal_failure_rate=0.0,rate_limits=None,time_scale=1.0):
+
+        """
+        latency / failure_rate: defaults for every call.
+        latencies / failure_rates: optional overrides keyed by provider or "provider:operation".
+        rate_limits: optional {provider: (calls per second, burst)}.
+        """
+
+        self.seed = seed
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.failure_rate = failure_rate
+        self.failure_rates = failure_rates or {}
+        self.fatal_failure_rate = fatal_failure_rate
+        self.time_scale = time_scale
+
+        self._buckets = {provider: [burst,burst,rate,time.monotonic()]     # tokens, burst, rate, updated
+                         for provider,(rate,burst) in (rate_limits or {}).items()}
+        self._call_numbers = defaultdict(int)
+        self._lock = threading.Lock()
+
+        self.calls = defaultdict(int)
+        self.throttled = defaultdict(int)
+        self.failed = defaultdict(int)
+        self.simulated_seconds = defaultdict(float)
+
+    def call(self,provider,operation):
+
+        key = f"{provider}:{operation}"
+        with self._lock:
+            number = self._call_numbers[key]
+            self._call_numbers[key] = number + 1
+            self.calls[key] += 1
+            throttled = not self._take_token(provider)
+            if throttled:
+                self.throttled[key] += 1
+
+        if throttled:
+            raise TransientProvisioningError(f"429 Too Many Requests: {key}")
+
+        rng = random.Random(f"{self.seed}:{key}:{number}")
+        latency = self._lookup(self.latencies,provider,key,self.latency)(rng)
+        time.sleep(latency * self.time_scale)
+
+        roll = rng.random()
+        failure_rate = self._lookup(self.failure_rates,provider,key,self.failure_rate)
+        with self._lock:
+            self.simulated_seconds[key] += latency
+            if roll < self.fatal_failure_rate + failure_rate:
+                self.failed[key] += 1
+
+        if roll < self.fatal_failure_rate:
+            raise SimulatedCloudError(f"500 Internal Error: {key}")
+        if roll < self.fatal_failure_rate + failure_rate:
+            raise TransientProvisioningError(f"503 Service Unavailable: {key}")
+
+    @contextmanager
+    def installed(self):
+
+        previous = abstract_factory_patten.cloud_backend
+        abstract_factory_patten.cloud_backend = self
+        try:
+            yield self
+        finally:
+            abstract_factory_patten.cloud_backend = previous
+
+    def stats(self):
+
+        with self._lock:
+            return {key: {"calls": self.calls[key],"throttled": self.throttled[key],"failed": self.failed[key],
+                          "avg_latency_ms": self.simulated_seconds[key] / max(1,self.calls[key] - self.throttled[key]) * 1000}
+                    for key in sorted(self.calls)}
+
+    def _take_token(self,provider):
+
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            return True
+        now = time.monotonic()
+        tokens,burst,rate,updated = bucket
+        tokens = min(burst,tokens + (now - updated) * rate)
+        bucket[3] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True
+        bucket[0] = tokens
+        return False
+
+    @staticmethod
+    def _lookup(overrides,provider,key,default):
+
+        value = overrides.get(key)
+        if value is None:
+            value = overrides.get(provider,default)
+        return value
+
+
+if __name__ == "__main__":
+
+    import contextlib
+    import io
+
+    from abstract_factory_patten import AWSFactory,AzureFactory
+    from abstract_factory_provisioning import ProvisioningEngine,provision_many
+
+    # One stack, timed step by step against simulated APIs
+    cloud = SimulatedCloud(seed=7,latencies={"aws:ec2.run_instances": constant(0.3),
+                                             "aws:s3.create_bucket": constant(0.2),
+                                             "aws:ec2.create_security_group": constant(0.1)})
+    with cloud.installed(),contextlib.redirect_stdout(io.StringIO()):
+        engine = ProvisioningEngine()
+        report = engine.provision(AWSFactory())
+        engine.shutdown()
+    print(report)
+
+    # Throughput of region bring-up at different concurrency levels, same seed each time
+    print(f"\n{'provider':<8} {'concurrency':>11} {'stacks/s':>9} {'retries':>8} {'failed':>7}")
+    for factory,provider in ((AWSFactory(),"aws"),(AzureFactory(),"azure")):
+        for concurrency in (4,16,64):
+            cloud = SimulatedCloud(seed=42,latency=lognormal(0.02,0.6),failure_rate=0.05,
+                                   rate_limits={provider: (400,50)})
+            with cloud.installed(),contextlib.redirect_stdout(io.StringIO()):
+                result = provision_many(factory,200,concurrency=concurrency,progress=False)
+            print(f"{provider:<8} {concurrency:>11} {result.throughput:>9.1f} {result.retries:>8} {len(result.failures):>7}")
+
+    print()
+    for key,stats in cloud.stats().items():
+        print(key,stats)
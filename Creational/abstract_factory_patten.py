@@ -81,7 +81,9 @@ class App:
 
 # Call Main
 
-App.main()
+if __name__ == "__main__":
+
+    App.main()
 
 """
 Why this approach Breaks Down
@@ -121,9 +123,17 @@ class Button(ABC):
     def on_click(self):
         pass
 
+    def record(self,display_list,control):
+        display_list.record(self,control)
+
+    def paint_batch(self,controls):
+        print(f"Painting {len(controls)} x {self.kind}")
+
 #Concreate Product Classes
 class LinuxButton(Button):
 
+    kind = "Linux Button"
+
     def paint(self):
 
         print("Painting with Linux Button")
@@ -134,6 +144,8 @@ class LinuxButton(Button):
 
 class WindowsButton(Button):
 
+    kind = "Windows Button"
+
     def paint(self):
         
         print("Painting With Windows Button")
@@ -152,10 +164,18 @@ class Checkbox(ABC):
     def on_click(self):
         pass
 
+    def record(self,display_list,control):
+        display_list.record(self,control)
+
+    def paint_batch(self,controls):
+        print(f"Painting {len(controls)} x {self.kind}")
+
 #Concreate Product Classes
 
 class LinuxCheckbox(Checkbox):
 
+    kind = "Linux Checkbox"
+
     def paint(self):
 
         print("Painting with Linux Checkbox ")
@@ -166,6 +186,8 @@ class LinuxCheckbox(Checkbox):
 
 class WindowsCheckbox(Checkbox):
 
+    kind = "Windows Checkbox"
+
     def paint(self):
         
         print("Painting with Windows Checkbox ")
@@ -188,74 +210,267 @@ class GUIFactory(ABC):
 
 ## Concrete Factories
 
+# The widgets hold no state of their own, so each factory hands out one shared instance
+# per widget type (Flyweight) instead of allocating a new object for every control.
+
 class WindowsFactory(GUIFactory):
 
+    _button = WindowsButton()
+    _checkbox = WindowsCheckbox()
+
     def create_button(self):
         
-        return WindowsButton()
+        return self._button
     
     def create_checkbox(self):
     
-        return WindowsCheckbox()
+        return self._checkbox
 
 class LinuxFactory(GUIFactory):
 
+    _button = LinuxButton()
+    _checkbox = LinuxCheckbox()
+
     def create_button(self):
-        return LinuxButton()
+        return self._button
     def create_checkbox(self):
-        return LinuxCheckbox()
+        return self._checkbox
+
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def resolve_gui_factory():
+
+    # The OS can't change while the process runs: detect it once, reuse the factory
+    if "Windows" in platform.system():
+        return WindowsFactory()
+    return LinuxFactory()
+
+## Rendering: display list + dirty tracking
+
+def union(a,b):
+
+    # Bounds are (x, y, width, height); None is the empty region
+    if a is None:
+        return b
+    x,y = min(a[0],b[0]),min(a[1],b[1])
+    return (x,y,max(a[0] + a[2],b[0] + b[2]) - x,max(a[1] + a[3],b[1] + b[3]) - y)
+
+def overlaps(a,b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+class Control:
+
+    # Per-control (extrinsic) state; the widget itself is the factory's shared flyweight
+    __slots__ = ("name","widget","bounds","state")
+
+    def __init__(self,name,widget,bounds,state):
+
+        self.name = name
+        self.widget = widget
+        self.bounds = bounds
+        self.state = state
+
+class DisplayList:
+
+    def __init__(self):
+
+        self.ops = []
+        self.region = None
+
+    def record(self,widget,control):
+
+        self.ops.append((widget,control))
+        self.region = union(self.region,control.bounds)
+
+    def damage(self,bounds):
+        # Area to repaint with no op of its own, e.g. what a moved control left behind
+        self.region = union(self.region,bounds)
+
+    def flush(self):
+
+        """ Submits every recorded op in one batch, one paint_batch call per widget type. Returns (ops, region). """
+
+        batches = {}
+        for widget,control in self.ops:
+            batches.setdefault(widget,[]).append(control)
+        for widget,controls in batches.items():
+            widget.paint_batch(controls)
+
+        frame = (len(self.ops),self.region)
+        self.ops = []
+        self.region = None
+        return frame
 
 class Application:
 
     def __init__(self,factory):
 
+        self.factory = factory
         self.button = factory.create_button()
         self.checkbox = factory.create_checkbox()
-    
+
+        self.controls = {}
+        self.display_list = DisplayList()
+        self._dirty = {}        # name -> Control changed since the last frame, in change order
+
+        self.add_control("button",self.button,(0,0,120,30))
+        self.add_control("checkbox",self.checkbox,(0,40,120,20))
+
+    def add_control(self,name,widget,bounds,**state):
+
+        control = Control(name,widget,bounds,state)
+        self.controls[name] = control
+        self._dirty[name] = control
+        return control
+
+    def update(self,name,**state):
+
+        control = self.controls[name]
+        if any(control.state.get(key) != value for key,value in state.items()):
+            control.state.update(state)
+            self._dirty[name] = control
+
+    def move(self,name,bounds):
+
+        control = self.controls[name]
+        if bounds == control.bounds:
+            return
+        # The area the control leaves and the one it moves onto both have to be drawn again,
+        # along with every control in either of them
+        self.display_list.damage(control.bounds)
+        for other in self.controls.values():
+            if overlaps(other.bounds,control.bounds) or overlaps(other.bounds,bounds):
+                self._dirty[other.name] = other
+        control.bounds = bounds
+        self._dirty[name] = control
+
     def render_ui(self):
-        
-        self.button.paint()
-        self.checkbox.paint()
+
+        """ Repaints only the controls changed since the last frame. Returns (ops, dirty region). """
+
+        for control in self._dirty.values():
+            control.widget.record(self.display_list,control)
+        self._dirty.clear()
+        return self.display_list.flush()
+
+GUIApplication = Application    # the cloud example below reuses the name Application
 
 class AppLauncher:
 
     @staticmethod
     def main():
 
-        os = platform.system()
-
-        if "Windows" in os:
-            factory = WindowsFactory()
-        else:
-            factory = LinuxFactory()
+        factory = resolve_gui_factory()
         
-        app = Application(factory)
+        app = GUIApplication(factory)
         app.render_ui()
 
+        app.update("checkbox",checked=True)
+        app.render_ui()     # only the checkbox is repainted
+        app.render_ui()     # nothing changed, nothing painted
+
 if __name__ == "__main__":
 
     AppLauncher.main()
 
+    # Benchmark: building screens of 10k controls, old path vs cached factory + flyweights
+    import time
+    import tracemalloc
+
+    def old_screen(controls):
+        # What the factories did before: detect the OS per launch, allocate every widget
+        windows = "Windows" in platform.system()
+        button,checkbox = (WindowsButton,WindowsCheckbox) if windows else (LinuxButton,LinuxCheckbox)
+        return [button() if i % 2 else checkbox() for i in range(controls)]
+
+    def new_screen(controls):
+        factory = resolve_gui_factory()
+        return [factory.create_button() if i % 2 else factory.create_checkbox() for i in range(controls)]
+
+    for name,build in (("new object per control",old_screen),("cached factory + flyweights",new_screen)):
+        start = time.perf_counter()
+        for _ in range(100):
+            build(10_000)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        screen = build(10_000)
+        _,peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:<28} {elapsed * 10:6.2f} ms per 10k-control screen, peak {peak / 1024:7.1f} KiB, "
+              f"{len({id(widget) for widget in screen})} distinct widgets")
+
+    # Benchmark: 60 frames of a 10k-control screen where 10 checkboxes toggle per frame
+    import contextlib
+    import io
+
+    factory = resolve_gui_factory()
+    app = GUIApplication(factory)
+    for i in range(10_000):
+        widget = factory.create_button() if i % 2 else factory.create_checkbox()
+        app.add_control(f"control-{i}",widget,(i % 100 * 20,i // 100 * 20,18,18),checked=False)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for frame in range(60):
+            for control in app.controls.values():     # old path: paint() every widget every frame
+                control.widget.paint()
+        immediate = time.perf_counter() - start
+
+        app.render_ui()
+        start = time.perf_counter()
+        for frame in range(60):
+            for i in range(10):
+                name = f"control-{(frame * 10 + i) * 7 % 10_000}"
+                app.update(name,checked=not app.controls[name].state["checked"])
+            ops,region = app.render_ui()
+        batched = time.perf_counter() - start
+
+    print(f"60 frames, 10k controls  paint() every widget: {immediate * 1000:.1f} ms  "
+          f"display list + dirty tracking: {batched * 1000:.1f} ms ({ops} ops/frame, dirty region {region})")
+
         
 ## Real-World Usage        
 ##============================= Abstract Factory: Cloud Infrastructure Provisioning ===============
 
 
+# Optional backend the cloud products call while provisioning, e.g. the in-process
+# simulator in abstract_factory_cloud_simulator.py. None means no API calls are made.
+cloud_backend = None
+
+def call_cloud(provider,operation):
+
+    if cloud_backend is not None:
+        cloud_backend.call(provider,operation)
+
 ## Abstract Product
 
+# resource_type names the resource in a stack; depends_on lists the resource types it needs first
+
 class VirtualMachine(ABC):
+
+    resource_type = "vm"
+    depends_on = ("firewall",)      # a VM is launched into its security group
+
     @abstractmethod
     def provision(self):
         pass
 
 class StorageBucket(ABC):
 
+    resource_type = "storage"
+    depends_on = ()
+
     @abstractmethod
     def provision(self):
         pass
 
 class FireWallRules(ABC):
 
+    resource_type = "firewall"
+    depends_on = ()
+
     @abstractmethod
     def provision(self):
         pass
@@ -265,16 +480,19 @@ class FireWallRules(ABC):
 class EC2Instance(VirtualMachine):
 
     def provision(self):
+        call_cloud("aws","ec2.run_instances")
         print("Provisioning AWS EC2")
 
 class S3Bucket(StorageBucket):
 
     def provision(self):
+        call_cloud("aws","s3.create_bucket")
         print("Provisioning AWS S3")
 
 class SecurityGroups(FireWallRules):
 
     def provision(self):
+        call_cloud("aws","ec2.create_security_group")
         print("Provisioning AWS Security Groups")
 
 # Concrete Products (Azure Family)
@@ -282,16 +500,19 @@ class SecurityGroups(FireWallRules):
 class VMInstance(VirtualMachine):
 
     def provision(self):
+        call_cloud("azure","compute.virtual_machines.create")
         print("Provisioning of Azure VMInstance")
 
 class BlobStorage(StorageBucket):
 
     def provision(self):
+        call_cloud("azure","storage.blob_containers.create")
         print("Provisioning of Azure Blob Storage ")
     
 class NetworkSecurityGroup(FireWallRules):
 
     def provision(self):
+        call_cloud("azure","network.security_groups.create")
         print("Provisioning Azure Network Securiy")
 
 # Abstract Factory
@@ -343,8 +564,10 @@ class Application:
         storage.provision()
         security.provision()
 
-azure = Application.main(AzureFactory())
-aws   = Application.main(AWSFactory())
+if __name__ == "__main__":
+
+    azure = Application.main(AzureFactory())
+    aws   = Application.main(AWSFactory())
     
 
 
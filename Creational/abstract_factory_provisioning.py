@@ -0,0 +1,551 @@
+# Real-World Usage of the Abstract Factory: provisioning a cloud stack as a dependency graph
+
+"""
+Application.main(factory) (abstract_factory_patten.py) provisions the VM, storage and firewall
+one after another, so a stack takes the sum of all steps. ProvisioningEngine instead:
+
+    . Takes the products a CloudFactory creates and builds a DAG from each product's
+      resource_type / depends_on (a VM needs its firewall; storage needs nothing).
+    . Runs every step whose dependencies are done on a thread pool, so independent resources
+      are provisioned concurrently and the stack takes about as long as its longest path.
+    . Times each step. If a step fails, its dependents are skipped and ProvisioningError
+      carries the report.
+    . A step that raises TransientProvisioningError (throttling, timeouts) is retried with
+      exponential backoff and full jitter, up to max_attempts.
+
+provision_many(factory, n, concurrency=...) brings up n identical stacks, at most
+`concurrency` at a time, with a live progress and throughput line.
+
+IncrementalProvisioner keeps a local JSON state file with a content hash per provisioned
+resource. plan() diffs the factory's products against it; apply() provisions only what was
+created or changed, so re-running an unchanged stack costs a file read.
+"""
+
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED,ThreadPoolExecutor,as_completed,wait
+
+from abstract_factory_patten import CloudFactory
+
+
+class TransientProvisioningError(Exception):
+    # Raised by products for failures worth retrying: throttling, timeouts, 5xx responses
+    pass
+
+
+class ProvisioningError(Exception):
+
+    def __init__(self,message,report):
+        super().__init__(message)
+        self.report = report
+
+
+class ProvisioningStep:
+
+    def __init__(self,product):
+
+        self.product = product
+        self.name = product.resource_type
+        self.depends_on = tuple(product.depends_on)
+        self.status = "pending"     # pending | running | done | failed | skipped | unchanged
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.attempts = 0
+
+    @property
+    def duration(self):
+        return (self.finished - self.started) if self.finished is not None else None
+
+    def run(self,max_attempts=1,backoff_base=0.1,backoff_max=5.0):
+
+        self.status = "running"
+        self.started = time.perf_counter()
+        try:
+            while True:
+                self.attempts += 1
+                try:
+                    self.product.provision()
+                    return
+                except TransientProvisioningError:
+                    if self.attempts >= max_attempts:
+                        raise
+                    # Full jitter keeps hundreds of retrying stacks from hitting the API in lockstep
+                    time.sleep(random.uniform(0,min(backoff_max,backoff_base * 2 ** (self.attempts - 1))))
+        finally:
+            self.finished = time.perf_counter()
+
+
+class ProvisioningReport:
+
+    def __init__(self,factory,steps,elapsed):
+
+        self.factory = factory
+        self.steps = steps
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return all(step.status in ("done","unchanged") for step in self.steps.values())
+
+    @property
+    def retries(self):
+        return sum(max(0,step.attempts - 1) for step in self.steps.values())
+
+    def sum_of_steps(self):
+        return sum(step.duration or 0.0 for step in self.steps.values())
+
+    def critical_path(self):
+
+        # Longest chain of step durations through the DAG
+        longest = {}
+
+        def path(name):
+            if name not in longest:
+                step = self.steps[name]
+                longest[name] = (step.duration or 0.0) + max((path(dep) for dep in step.depends_on),default=0.0)
+            return longest[name]
+
+        return max((path(name) for name in self.steps),default=0.0)
+
+    def __str__(self):
+
+        lines = [f"{type(self.factory).__name__}: {self.elapsed * 1000:.0f} ms "
+                 f"(sum of steps {self.sum_of_steps() * 1000:.0f} ms, critical path {self.critical_path() * 1000:.0f} ms)"]
+        for step in self.steps.values():
+            timing = f"{step.duration * 1000:7.0f} ms" if step.duration is not None else "      - ms"
+            retries = f"  ({step.attempts - 1} retries)" if step.attempts > 1 else ""
+            lines.append(f"  {step.name:<10} {step.status:<8} {timing}{retries}" + (f"  {step.error!r}" if step.error else ""))
+        return "\n".join(lines)
+
+
+def stack_products(factory):
+    return [factory.create_firwall(),factory.create_storage(),factory.create_vir_machn()]
+
+
+class ProvisioningEngine:
+
+    def __init__(self,max_workers=8,max_attempts=5,backoff_base=0.1,backoff_max=5.0):
+
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def plan(self,factory,products=None):
+
+        """ Builds the steps for the factory's products and checks the graph is a DAG. """
+
+        if not isinstance(factory,CloudFactory):
+            raise TypeError(f"Expected a CloudFactory, got {type(factory).__name__}")
+
+        steps = {}
+        for product in products if products is not None else stack_products(factory):
+            if product.resource_type in steps:
+                raise ValueError(f"Duplicate resource in stack: {product.resource_type}")
+            steps[product.resource_type] = ProvisioningStep(product)
+
+        for step in steps.values():
+            for dep in step.depends_on:
+                if dep not in steps:
+                    raise ValueError(f"{step.name} depends on unknown resource {dep}")
+
+        self._check_acyclic(steps)
+        return steps
+
+    def provision(self,factory,only=None,products=None):
+
+        """ only: optional set of resource types to provision; the others are treated as already up. """
+
+        steps = self.plan(factory,products)
+        start = time.perf_counter()
+
+        if only is not None:
+            for name,step in steps.items():
+                if name not in only:
+                    step.status = "unchanged"
+
+        remaining = {name: {dep for dep in step.depends_on if steps[dep].status != "unchanged"}
+                     for name,step in steps.items() if step.status != "unchanged"}
+        dependents = {name: [] for name in steps}
+        for name,step in steps.items():
+            for dep in step.depends_on:
+                dependents[dep].append(name)
+
+        running = {}
+        executor = self._shared_executor()
+
+        def submit_ready():
+            for name in [name for name,deps in remaining.items() if not deps]:
+                del remaining[name]
+                running[executor.submit(steps[name].run,self.max_attempts,
+                                        self.backoff_base,self.backoff_max)] = name
+
+        submit_ready()
+        while running:
+            done,_ = wait(running,return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                step = steps[name]
+                error = future.exception()
+                if error is None:
+                    step.status = "done"
+                    for dependent in dependents[name]:   # unchanged steps never run, so never get here
+                        if dependent in remaining:
+                            remaining[dependent].discard(name)
+                else:
+                    step.status = "failed"
+                    step.error = error
+                    self._skip_dependents(name,steps,dependents,remaining)
+            submit_ready()
+
+        report = ProvisioningReport(factory,steps,time.perf_counter() - start)
+        if not report.ok:
+            failed = [step.name for step in steps.values() if step.status == "failed"]
+            raise ProvisioningError(f"Provisioning failed for {', '.join(failed)}",report)
+        return report
+
+    def shutdown(self):
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _shared_executor(self):
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,thread_name_prefix="provision")
+            return self._executor
+
+    @staticmethod
+    def _skip_dependents(name,steps,dependents,remaining):
+
+        stack = list(dependents[name])
+        while stack:
+            dependent = stack.pop()
+            if dependent in remaining:
+                del remaining[dependent]
+                steps[dependent].status = "skipped"
+                stack.extend(dependents[dependent])
+
+    @staticmethod
+    def _check_acyclic(steps):
+
+        visiting,visited = set(),set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through {name}")
+            visiting.add(name)
+            for dep in steps[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in steps:
+            visit(name)
+
+
+class BulkProvisioningReport:
+
+    def __init__(self,reports,failures,elapsed):
+
+        self.reports = reports      # ProvisioningReport of every stack that came up
+        self.failures = failures    # ProvisioningError of every stack that didn't
+        self.elapsed = elapsed
+
+    @property
+    def throughput(self):
+        return len(self.reports) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def retries(self):
+        return sum(report.retries for report in self.reports) + sum(error.report.retries for error in self.failures)
+
+    def __str__(self):
+        return (f"{len(self.reports)} stacks up, {len(self.failures)} failed, {self.retries} retries "
+                f"in {self.elapsed:.2f}s ({self.throughput:.1f} stacks/s)")
+
+
+class ProgressReporter:
+
+    """ Rewrites one status line at most every `interval` seconds. """
+
+    def __init__(self,total,stream=sys.stdout,interval=0.25):
+
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def __call__(self,done,failed,retries,final=False):
+
+        now = time.perf_counter()
+        if not final and now - self._last < self.interval:
+            return
+        self._last = now
+
+        elapsed = now - self.start
+        rate = done / elapsed if elapsed else 0.0
+        eta = (self.total - done - failed) / rate if rate else float("inf")
+        self.stream.write(f"\r[{done + failed:>{len(str(self.total))}}/{self.total}] {rate:6.1f} stacks/s  "
+                          f"{retries} retries  {failed} failed  ETA {eta:5.1f}s" + ("\n" if final else ""))
+        self.stream.flush()
+
+
+def provision_many(factory,n,concurrency=8,engine=None,progress=None):
+
+    """
+    Provisions n stacks from one factory, at most `concurrency` at a time.
+    progress(done, failed, retries, final=False) is called as stacks finish; defaults to a
+    ProgressReporter on stdout. Pass progress=False to stay quiet.
+    """
+
+    own_engine = engine is None
+    if own_engine:
+        # Each stack in flight can have all of its steps running at once
+        engine = ProvisioningEngine(max_workers=concurrency * len(stack_products(factory)))
+    if progress is None:
+        progress = ProgressReporter(n)
+
+    reports,failures = [],[]
+    retries = 0
+    start = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency,thread_name_prefix="stack") as stacks:
+            futures = [stacks.submit(engine.provision,factory) for _ in range(n)]
+            for future in as_completed(futures):
+                try:
+                    report = future.result()
+                    reports.append(report)
+                    retries += report.retries
+                except ProvisioningError as error:
+                    failures.append(error)
+                    retries += error.report.retries
+                if progress:
+                    progress(len(reports),len(failures),retries)
+    finally:
+        if own_engine:
+            engine.shutdown()
+
+    if progress:
+        progress(len(reports),len(failures),retries,final=True)
+    return BulkProvisioningReport(reports,failures,time.perf_counter() - start)
+
+
+def resource_hash(product):
+
+    """ Content hash of a product: its class and public configuration. """
+
+    config = {key: value for key,value in vars(product).items() if not key.startswith("_")}
+    canonical = json.dumps({"class": f"{type(product).__module__}.{type(product).__qualname__}",
+                            "config": config},sort_keys=True,default=repr)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ProvisioningPlan:
+
+    def __init__(self,stack,factory,products,hashes,changes):
+
+        self.stack = stack
+        self.factory = factory
+        self.products = products
+        self.hashes = hashes        # resource type -> desired content hash
+        self.changes = changes      # resource type -> "create" | "update" | "delete" | "no-op"
+
+    def to_provision(self):
+        return {name for name,action in self.changes.items() if action in ("create","update")}
+
+    @property
+    def empty(self):
+        return all(action == "no-op" for action in self.changes.values())
+
+    def __str__(self):
+
+        symbols = {"create": "+","update": "~","delete": "-","no-op": " "}
+        lines = [f"Plan for {self.stack}: " + ("no changes" if self.empty else
+                 ", ".join(f"{sum(a == action for a in self.changes.values())} to {action}"
+                           for action in ("create","update","delete") if action in self.changes.values()))]
+        lines += [f"  {symbols[action]} {name} ({action})" for name,action in self.changes.items()]
+        return "\n".join(lines)
+
+
+class StateFile:
+
+    """ {"stacks": {stack: {resource type: {"hash", "class", "provisioned_at"}}}}, written atomically. """
+
+    def __init__(self,path):
+        self.path = path
+
+    def load(self):
+
+        try:
+            with open(self.path,encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"version": 1,"stacks": {}}
+
+    def save(self,state):
+
+        temporary = f"{self.path}.tmp"
+        with open(temporary,"w",encoding="utf-8") as file:
+            json.dump(state,file,indent=2,sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary,self.path)     # a crash never leaves a half-written state file
+
+
+class IncrementalProvisioner:
+
+    def __init__(self,state_path,engine=None):
+
+        self.state = StateFile(state_path)
+        self.engine = engine or ProvisioningEngine()
+
+    def plan(self,factory,stack=None):
+
+        stack = stack or type(factory).__name__
+        products = stack_products(factory)
+        hashes = {product.resource_type: resource_hash(product) for product in products}
+        recorded = self.state.load()["stacks"].get(stack,{})
+
+        changes = {}
+        for name,digest in hashes.items():
+            if name not in recorded:
+                changes[name] = "create"
+            elif recorded[name]["hash"] != digest:
+                changes[name] = "update"
+            else:
+                changes[name] = "no-op"
+        for name in recorded:
+            if name not in hashes:
+                changes[name] = "delete"    # the products can't be torn down; the record is dropped
+
+        return ProvisioningPlan(stack,factory,products,hashes,changes)
+
+    def apply(self,plan):
+
+        """ Provisions what the plan creates or updates and records every step that succeeded. """
+
+        report = None
+        error = None
+        if plan.to_provision():
+            try:
+                report = self.engine.provision(plan.factory,only=plan.to_provision(),products=plan.products)
+            except ProvisioningError as failure:
+                report,error = failure.report,failure
+
+        state = self.state.load()
+        recorded = state["stacks"].setdefault(plan.stack,{})
+        now = time.time()
+
+        for name,action in plan.changes.items():
+            if action == "delete":
+                recorded.pop(name,None)
+            elif action in ("create","update") and report.steps[name].status == "done":
+                product = report.steps[name].product
+                recorded[name] = {"hash": plan.hashes[name],"class": type(product).__name__,"provisioned_at": now}
+
+        if plan.changes and not plan.empty:
+            self.state.save(state)
+        if error is not None:
+            raise error
+        return report
+
+
+if __name__ == "__main__":
+
+    from abstract_factory_patten import AWSFactory,EC2Instance,S3Bucket,SecurityGroups
+
+    # Each step takes a while, as real cloud APIs do
+    class SlowEC2Instance(EC2Instance):
+        def provision(self):
+            time.sleep(0.3)
+            super().provision()
+
+    class SlowS3Bucket(S3Bucket):
+        def provision(self):
+            time.sleep(0.4)
+            super().provision()
+
+    class SlowSecurityGroups(SecurityGroups):
+        def provision(self):
+            time.sleep(0.2)
+            super().provision()
+
+    class SlowAWSFactory(AWSFactory):
+
+        def create_vir_machn(self):
+            return SlowEC2Instance()
+        def create_storage(self):
+            return SlowS3Bucket()
+        def create_firwall(self):
+            return SlowSecurityGroups()
+
+    engine = ProvisioningEngine()
+    print(engine.provision(SlowAWSFactory()))
+    engine.shutdown()
+
+    # Region bring-up: 100 stacks against an API that throttles 10% of calls
+    from abstract_factory_patten import AzureFactory,BlobStorage,NetworkSecurityGroup,VMInstance
+
+    def flaky(product_class,latency):
+
+        class FlakyProduct(product_class):
+            def provision(self):
+                time.sleep(latency)
+                if random.random() < 0.1:
+                    raise TransientProvisioningError("429 Too Many Requests")
+
+        return FlakyProduct
+
+    class FlakyAzureFactory(AzureFactory):
+
+        vm,storage,firewall = flaky(VMInstance,0.03),flaky(BlobStorage,0.05),flaky(NetworkSecurityGroup,0.02)
+
+        def create_vir_machn(self):
+            return self.vm()
+        def create_storage(self):
+            return self.storage()
+        def create_firwall(self):
+            return self.firewall()
+
+    print(provision_many(FlakyAzureFactory(),100,concurrency=16))
+
+    # Incremental runs against a state file: only changed resources are provisioned again
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        provisioner = IncrementalProvisioner(os.path.join(directory,"state.json"),engine=ProvisioningEngine())
+
+        for factory in (SlowAWSFactory(),SlowAWSFactory()):
+            start = time.perf_counter()
+            plan = provisioner.plan(factory,stack="prod")
+            print(plan)
+            provisioner.apply(plan)
+            print(f"  applied in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        class BiggerBucketAWSFactory(SlowAWSFactory):
+            def create_storage(self):
+                bucket = SlowS3Bucket()
+                bucket.size_gb = 500    # a config change: only the bucket is re-provisioned
+                return bucket
+
+        plan = provisioner.plan(BiggerBucketAWSFactory(),stack="prod")
+        print(plan)
+        print(provisioner.apply(plan))
+        provisioner.engine.shutdown()
@@ -0,0 +1,231 @@
+# Real-World Usage of the Builder: sending large batches of HttpRequest objects with asyncio
+
+"""
+AsyncHttpExecutor is the asyncio counterpart of HttpClient (builder_http_client.py):
+
+    . execute_many(requests, concurrency=...) keeps at most `concurrency` requests in flight
+      and yields (request, response) pairs in completion order.
+    . max_connections_per_host caps concurrent requests to any single host.
+    . Connections are kept alive and reused per (scheme, host, port).
+    . request.timeout (milliseconds) bounds each request, including the wait for a host slot.
+    . Streaming bodies are written chunk by chunk, draining after each one, in constant memory.
+"""
+
+import asyncio
+import ssl
+from collections import deque
+
+from builder_http_client import HttpResponse
+from builder_pattern import HttpRequest
+
+
+class AsyncHttpExecutor:
+
+    def __init__(self,max_connections_per_host=10):
+
+        self.max_connections_per_host = max_connections_per_host
+        self._idle = {}         # (scheme, host, port) -> deque of (reader, writer)
+        self._host_slots = {}   # (scheme, host, port) -> asyncio.Semaphore
+
+    async def execute(self,request):
+
+        return await asyncio.wait_for(self._execute(request),request.timeout / 1000)
+
+    async def execute_many(self,requests,concurrency=100):
+
+        """
+        Yields (request, response) in completion order. A failed request is yielded with
+        its exception in place of the response, so one bad request doesn't stop the batch.
+        """
+
+        pending = set()
+        requests = iter(requests)
+
+        def fill():
+            for request in requests:
+                task = asyncio.ensure_future(self.execute(request))
+                task.request = request
+                pending.add(task)
+                if len(pending) >= concurrency:
+                    return
+
+        try:
+            fill()
+            while pending:
+                done,_ = await asyncio.wait(pending,return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    yield task.request,(task.exception() or task.result())
+                fill()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def close(self):
+
+        for connections in self._idle.values():
+            while connections:
+                _,writer = connections.pop()
+                writer.close()
+        self._idle.clear()
+
+    async def _execute(self,request):
+
+        key = request.address()
+        slots = self._host_slots.get(key)
+        if slots is None:
+            slots = self._host_slots[key] = asyncio.Semaphore(self.max_connections_per_host)
+
+        async with slots:
+            reader,writer,reused = await self._acquire(key)
+            try:
+                response,reusable = await self._send(reader,writer,request)
+            except (ConnectionResetError,BrokenPipeError,asyncio.IncompleteReadError):
+                writer.close()
+                if not reused or request.has_stream_body():
+                    raise   # a consumed stream can't be replayed
+                # The server closed an idle keep-alive connection; retry once on a fresh one
+                reader,writer,_ = await self._acquire(key,fresh=True)
+                try:
+                    response,reusable = await self._send(reader,writer,request)
+                except BaseException:
+                    writer.close()
+                    raise
+            except BaseException:
+                writer.close()      # also on timeout/cancel: the connection is mid-request
+                raise
+
+            if reusable:
+                self._idle.setdefault(key,deque()).append((reader,writer))
+            else:
+                writer.close()
+            return response
+
+    async def _acquire(self,key,fresh=False):
+
+        connections = self._idle.get(key)
+        while connections and not fresh:
+            reader,writer = connections.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader,writer,True
+            writer.close()
+
+        scheme,host,port = key
+        reader,writer = await asyncio.open_connection(
+            host,port,ssl=ssl.create_default_context() if scheme == "https" else None)
+        return reader,writer,False
+
+    async def _send(self,reader,writer,request):
+
+        # The head and an in-memory body are cached bytes on the request, so writing them copies nothing
+        writer.write(request.wire_head())
+        for chunk in request.iter_wire_body():
+            writer.write(chunk)
+            await writer.drain()    # backpressure: at most one chunk of a stream is buffered
+        await writer.drain()
+        return await read_response(reader,request.method)
+
+
+async def read_response(reader,method):
+
+    """ Reads one HTTP/1.1 response. Returns (HttpResponse, connection_reusable). """
+
+    while True:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before the response")
+
+        version,status,*reason = status_line.decode("latin-1").rstrip("\r\n").split(" ",2)
+        status = int(status)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n",b"\n",b""):
+                break
+            name,value = line.decode("latin-1").split(":",1)
+            headers[name.strip()] = value.strip()
+
+        if status >= 200 or status == 101:
+            break       # skip interim 1xx responses such as 100 Continue
+
+    lowered = {name.lower(): value.lower() for name,value in headers.items()}
+    reusable = version != "HTTP/1.0" and lowered.get("connection") != "close"
+
+    if method == "HEAD" or status in (204,304):
+        body = b""
+    elif "chunked" in lowered.get("transfer-encoding",""):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";",1)[0],16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n",b"\n",b""):
+                    pass    # trailers
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in lowered:
+        body = await reader.readexactly(int(lowered["content-length"]))
+    else:
+        body = await reader.read()  # delimited by connection close
+        reusable = False
+
+    return HttpResponse(status,reason[0] if reason else "",headers,body),reusable
+
+
+# Usage against a local stand-in server
+
+if __name__ == "__main__":
+
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+
+    class StandInHandler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+
+            if self.path.startswith("/slow"):
+                time.sleep(0.5)
+            body = f'{{"path": "{self.path}"}}'.encode()
+            self.send_response(200)
+            self.send_header("Content-Length",str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self,*args):
+            pass
+
+    async def main():
+
+        server = ThreadingHTTPServer(("127.0.0.1",0),StandInHandler)
+        threading.Thread(target=server.serve_forever,daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        requests = HttpRequest.Builder.build_many(
+            HttpRequest.Builder(f"{base_url}/items").timeout(5000),
+            [{"path": f"/{i}"} for i in range(2000)])
+        requests.append(HttpRequest.Builder(f"{base_url}/slow").timeout(100).build())
+
+        executor = AsyncHttpExecutor(max_connections_per_host=8)
+        start = time.perf_counter()
+        ok = failed = 0
+
+        async for request,response in executor.execute_many(requests,concurrency=64):
+            if isinstance(response,Exception):
+                failed += 1
+                print(f"{request.url} failed: {type(response).__name__}")
+            else:
+                ok += 1
+
+        elapsed = time.perf_counter() - start
+        print(f"{ok} ok, {failed} failed in {elapsed:.2f}s ({ok / elapsed:.0f} req/s)")
+
+        await executor.close()
+        server.shutdown()
+
+    asyncio.run(main())
@@ -0,0 +1,281 @@
+# Real-World Usage of the Builder: caching responses for repeated HttpRequest objects
+
+"""
+CachingHttpClient wraps HttpClient (builder_http_client.py) with an HTTP response cache:
+
+    . Keyed on HttpRequest.fingerprint(), so equal GET/HEAD requests share one entry.
+    . Honors Cache-Control (no-store, no-cache, max-age) and Expires on responses,
+      and no-store/no-cache on requests.
+    . Stale entries are revalidated with If-None-Match / If-Modified-Since; a 304 refreshes them.
+    . Bounded by entry count and total body bytes, evicting least recently used entries.
+    . Concurrent identical requests are collapsed: one thread fetches, the others wait for its result.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from email.utils import parsedate_to_datetime
+
+from builder_http_client import HttpClient,HttpResponse
+from builder_pattern import HttpRequest
+
+
+CACHEABLE_METHODS = ("GET","HEAD")
+
+
+def parse_cache_control(value):
+
+    directives = {}
+    for part in (value or "").split(","):
+        name,_,argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def _header(headers,name):
+
+    name = name.lower()
+    for key,value in headers.items():
+        if str(key).lower() == name:
+            return value
+    return None
+
+
+class CacheEntry:
+
+    def __init__(self,response,expires_at):
+
+        self.response = response
+        self.expires_at = expires_at
+        self.etag = _header(response.headers,"ETag")
+        self.last_modified = _header(response.headers,"Last-Modified")
+        self.size = len(response.body)
+
+    def is_fresh(self,now):
+        return now < self.expires_at
+
+    def has_validators(self):
+        return self.etag is not None or self.last_modified is not None
+
+
+class CachingHttpClient:
+
+    def __init__(self,client=None,max_entries=1024,max_bytes=64 * 1024 * 1024):
+
+        self.client = client or HttpClient()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()   # fingerprint -> CacheEntry, least recently used first
+        self._bytes = 0
+        self._inflight = {}             # fingerprint -> Future shared by collapsed callers
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.collapsed = 0
+
+    def execute(self,request):
+
+        if request.method.upper() not in CACHEABLE_METHODS or request.has_stream_body():
+            return self.client.execute(request)
+
+        request_directives = parse_cache_control(_header(request.headers,"Cache-Control"))
+        if "no-store" in request_directives:
+            return self.client.execute(request)
+
+        key = request.fingerprint()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and "no-cache" not in request_directives and entry.is_fresh(time.time()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.response
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            # The fingerprint ignores the timeout, so the leader's fetch may be allowed to run longer than ours
+            try:
+                return future.result(None if request.timeout is None else request.timeout / 1000)
+            except FuturesTimeoutError:
+                raise TimeoutError("HttpRequest timeout exceeded while waiting for an identical request") from None
+
+        try:
+            response = self._fetch(key,request,entry)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def stats(self):
+
+        with self._lock:
+            return {"entries": len(self._entries),"bytes": self._bytes,"hits": self.hits,
+                    "misses": self.misses,"revalidated": self.revalidated,"collapsed": self.collapsed}
+
+    def clear(self):
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _fetch(self,key,request,entry):
+
+        if entry is not None and entry.has_validators():
+
+            conditional = request.derive()
+            if entry.etag is not None:
+                conditional.add_header("If-None-Match",entry.etag)
+            if entry.last_modified is not None:
+                conditional.add_header("If-Modified-Since",entry.last_modified)
+
+            response = self.client.execute(conditional.build())
+            if response.status == 304:
+                # Not modified: keep the cached body, take the refreshed caching headers
+                cached = entry.response
+                headers = {**cached.headers,**{name: value for name,value in response.headers.items()
+                                               if name.lower() not in ("content-length","transfer-encoding")}}
+                refreshed = HttpResponse(cached.status,cached.reason,headers,cached.body)
+                with self._lock:
+                    self.revalidated += 1
+                self._store(key,refreshed)
+                return refreshed
+        else:
+            response = self.client.execute(request)
+
+        self._store(key,response)
+        return response
+
+    def _store(self,key,response):
+
+        if response.status != 200:
+            return
+
+        directives = parse_cache_control(_header(response.headers,"Cache-Control"))
+        if "no-store" in directives:
+            with self._lock:
+                self._remove(key)
+            return
+
+        expires_at = self._expires_at(response,directives)
+        entry = CacheEntry(response,expires_at)
+        if entry.size > self.max_bytes or (expires_at <= time.time() and not entry.has_validators()):
+            return      # too big, or useless: already stale with no way to revalidate
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _,evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def _remove(self,key):
+
+        entry = self._entries.pop(key,None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    @staticmethod
+    def _expires_at(response,directives):
+
+        now = time.time()
+        if "no-cache" in directives:
+            return now      # may be stored, but must be revalidated every time
+
+        if directives.get("max-age") is not None:
+            try:
+                age = int(_header(response.headers,"Age") or 0)
+                return now + int(directives["max-age"]) - age
+            except ValueError:
+                return now
+
+        expires = _header(response.headers,"Expires")
+        if expires is not None:
+            try:
+                return parsedate_to_datetime(expires).timestamp()
+            except (TypeError,ValueError):
+                return now
+        return now
+
+
+# Usage against a local stand-in server
+
+if __name__ == "__main__":
+
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+
+    class StandInHandler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+        hits = 0
+        etag = '"v1"'
+
+        def do_GET(self):
+
+            StandInHandler.hits += 1
+            time.sleep(0.05)
+
+            if self.headers.get("If-None-Match") == self.etag:
+                self.send_response(304)
+                self.send_header("Cache-Control","max-age=1")
+                self.send_header("Content-Length","0")
+                self.end_headers()
+                return
+
+            body = b'{"config": "prod"}'
+            self.send_response(200)
+            self.send_header("Cache-Control","max-age=1")
+            self.send_header("ETag",self.etag)
+            self.send_header("Content-Length",str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self,*args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1",0),StandInHandler)
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+
+    cache = CachingHttpClient(HttpClient(max_connections_per_host=8),max_entries=100)
+    request = HttpRequest.Builder(f"http://127.0.0.1:{server.server_port}/config") \
+        .add_header("Accept","application/json") \
+        .add_query_param("env","prod") \
+        .timeout(2000) \
+        .build()
+
+    # 50 concurrent identical requests collapse into one network call
+    with ThreadPoolExecutor(max_workers=50) as executor:
+        list(executor.map(lambda _: cache.execute(request),range(50)))
+    print("After concurrent burst:",cache.stats(),"server hits:",StandInHandler.hits)
+
+    # A separately built but equal request is served from the cache
+    same = HttpRequest.Builder(request.url).add_query_param("env","prod") \
+        .add_header("accept","application/json").build()
+    print(cache.execute(same),"server hits:",StandInHandler.hits)
+
+    # Once stale, the entry is revalidated with If-None-Match and refreshed by a 304
+    time.sleep(1.1)
+    print(cache.execute(request),"server hits:",StandInHandler.hits)
+    print(cache.stats())
+
+    server.shutdown()
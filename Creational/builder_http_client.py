@@ -0,0 +1,340 @@
+# Real-World Usage of the Builder: executing the HttpRequest objects it produces
+
+"""
+HttpRequest (builder_pattern.py) is only a data object. HttpClient sends it:
+
+    . One keep-alive connection pool per (scheme, host, port), capped at max_connections_per_host.
+    . request.timeout is enforced (in milliseconds) as a deadline covering pool wait, connect, send and response.
+    . The pre-encoded request (HttpRequest.write_into) is sent straight from a reusable per-thread buffer.
+    . Streaming bodies (files, iterables, mmap) are sent chunk by chunk in constant memory.
+    . Each pool tracks how long callers waited for a connection.
+"""
+
+import http.client
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+
+from builder_pattern import HttpRequest
+
+
+class PoolTimeoutError(TimeoutError):
+    pass
+
+
+class HttpResponse:
+
+    def __init__(self,status,reason,headers,body):
+
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def __str__(self):
+        return f"HttpResponse(status={self.status}, reason={self.reason}, body={len(self.body)} bytes)"
+
+
+class HostConnectionPool:
+
+    def __init__(self,scheme,host,port,max_size):
+
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+
+        # Pool wait-time metrics (seconds)
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def acquire(self,deadline,fresh=False):
+
+        """
+        Returns (sock, reused). Blocks while max_size connections are checked out.
+        fresh=True skips idle connections and opens a new one, closing an idle one if the pool is full.
+        """
+
+        start = time.perf_counter()
+
+        with self._cond:
+            while True:
+                if self._idle and not fresh:
+                    self._record_wait(time.perf_counter() - start)
+                    return self._idle.pop(),True
+                if self._open < self.max_size:
+                    break
+                if self._idle:
+                    # Make room; an idle connection is likely as stale as the one that just failed
+                    self._idle.popleft().close()
+                    self._open -= 1
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._record_wait(time.perf_counter() - start)
+                    raise PoolTimeoutError(f"No free connection to {self.host}:{self.port} within timeout")
+                self._cond.wait(remaining)
+
+            self._record_wait(time.perf_counter() - start)
+            self._open += 1
+
+        try:
+            return self._connect(deadline),False
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def release(self,sock,reusable):
+
+        with self._cond:
+            if reusable:
+                self._idle.append(sock)
+            else:
+                sock.close()
+                self._open -= 1
+            self._cond.notify()
+
+    def close(self):
+
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+
+    def stats(self):
+
+        with self._cond:
+            return {
+                "open": self._open,
+                "idle": len(self._idle),
+                "wait_count": self.wait_count,
+                "wait_avg_ms": (self.wait_total / self.wait_count * 1000) if self.wait_count else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+    def _record_wait(self,waited):
+
+        self.wait_count += 1
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+
+    def _connect(self,deadline):
+
+        sock = socket.create_connection((self.host,self.port),timeout=_remaining(deadline))
+        sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+
+        if self.scheme == "https":
+            sock = ssl.create_default_context().wrap_socket(sock,server_hostname=self.host)
+        return sock
+
+
+def _remaining(deadline):
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("HttpRequest timeout exceeded")
+    return remaining
+
+
+class HttpClient:
+
+    def __init__(self,max_connections_per_host=10):
+
+        self.max_connections_per_host = max_connections_per_host
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def execute(self,request):
+
+        deadline = time.monotonic() + request.timeout / 1000
+        scheme,host,port = request.address()
+        pool = self._pool(scheme,host,port)
+
+        sock,reused = pool.acquire(deadline)
+        try:
+            response,reusable = self._send(sock,request,deadline)
+        except (http.client.RemoteDisconnected,ConnectionResetError,BrokenPipeError):
+            pool.release(sock,False)
+            if not reused or request.has_stream_body():
+                raise   # a consumed stream can't be replayed
+            # The server closed an idle keep-alive connection; retry once on a fresh one
+            sock,_ = pool.acquire(deadline,fresh=True)
+            try:
+                response,reusable = self._send(sock,request,deadline)
+            except BaseException:
+                pool.release(sock,False)
+                raise
+        except BaseException:
+            pool.release(sock,False)
+            raise
+
+        pool.release(sock,reusable)
+        return response
+
+    def pool_stats(self):
+
+        with self._lock:
+            pools = list(self._pools.items())
+        return {f"{scheme}://{host}:{port}": pool.stats() for (scheme,host,port),pool in pools}
+
+    def close(self):
+
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close()
+
+    def _pool(self,scheme,host,port):
+
+        key = (scheme,host,port)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = HostConnectionPool(scheme,host,port,self.max_connections_per_host)
+                    self._pools[key] = pool
+        return pool
+
+    def _buffer(self):
+
+        buffer = getattr(self._local,"buffer",None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray(8192)
+        return buffer
+
+    def _send(self,sock,request,deadline):
+
+        sock.settimeout(_remaining(deadline))
+        view = request.write_into(self._buffer())
+        try:
+            sock.sendall(view)
+        finally:
+            view.release()
+
+        if request.has_stream_body():
+            for chunk in request.iter_wire_body():
+                sock.settimeout(_remaining(deadline))
+                sock.sendall(chunk)
+
+        response = http.client.HTTPResponse(sock,method=request.method)
+        try:
+            sock.settimeout(_remaining(deadline))
+            response.begin()
+            sock.settimeout(_remaining(deadline))
+            body = response.read()
+        finally:
+            response.close()
+
+        return (HttpResponse(response.status,response.reason,dict(response.getheaders()),body),
+                not response.will_close)
+
+
+# Usage against a local stand-in server
+
+if __name__ == "__main__":
+
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+
+    class StandInHandler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"   # keep-alive
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+
+            if self.path.startswith("/slow"):
+                time.sleep(0.5)
+            self._reply(f'{{"path": "{self.path}"}}'.encode())
+
+        def do_POST(self):
+
+            if self.headers.get("Transfer-Encoding") == "chunked":
+                body = b""
+                while size := int(self.rfile.readline().split(b";")[0],16):
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+                self.rfile.readline()
+            else:
+                body = self.rfile.read(int(self.headers.get("Content-Length",0)))
+            self._reply(body)
+
+        def _reply(self,body):
+
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type","application/json")
+                self.send_header("Content-Length",str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError,ConnectionResetError):
+                self.close_connection = True    # the client gave up waiting (see the timeout below)
+
+        def log_message(self,*args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1",0),StandInHandler)
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    client = HttpClient(max_connections_per_host=4)
+
+    print(client.execute(HttpRequest.Builder(f"{base_url}/data").timeout(1500).build()))
+    print(client.execute(HttpRequest.Builder(f"{base_url}/data").method("POST").body('{"key":"value"}').build()))
+
+    # Streaming uploads: a file (Content-Length from fstat) and a generator (chunked)
+    import tempfile
+
+    with tempfile.TemporaryFile() as upload:
+        upload.write(b"x" * 1_000_000)
+        upload.seek(0)
+        print(client.execute(HttpRequest.Builder(f"{base_url}/upload").method("POST").body(upload).timeout(5000).build()))
+
+    chunks = (f"line {i}\n".encode() for i in range(1000))
+    print(client.execute(HttpRequest.Builder(f"{base_url}/upload").method("POST").body(chunks).timeout(5000).build()))
+
+    requests = HttpRequest.Builder.build_many(
+        HttpRequest.Builder(f"{base_url}/items").timeout(2000),
+        [{"path": f"/{i}"} for i in range(200)])
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        statuses = list(executor.map(lambda r: client.execute(r).status,requests))
+    print(f"{len(statuses)} requests, all OK: {all(s == 200 for s in statuses)}")
+
+    try:
+        client.execute(HttpRequest.Builder(f"{base_url}/slow").timeout(100).build())
+    except TimeoutError as error:
+        print("Timed out as expected:",error)
+
+    print(client.pool_stats())
+
+    # The server drops idle keep-alive connections after 0.2s; the pool still holds three of them
+    class IdleTimeoutHandler(StandInHandler):
+        timeout = 0.2
+
+    idle_server = ThreadingHTTPServer(("127.0.0.1",0),IdleTimeoutHandler)
+    threading.Thread(target=idle_server.serve_forever,daemon=True).start()
+    idle_url = f"http://127.0.0.1:{idle_server.server_port}"
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(client.execute,[HttpRequest.Builder(f"{idle_url}/slow").timeout(2000).build()] * 3))
+    time.sleep(0.5)
+    print("After the server's idle timeout:",client.execute(HttpRequest.Builder(f"{idle_url}/data").timeout(2000).build()))
+
+    client.close()
+    server.shutdown()
+    idle_server.shutdown()
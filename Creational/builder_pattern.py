@@ -81,29 +81,430 @@ The object itself typically has a private or package-private constructor, forcin
 
 ## Implementing Builder
 
+import hashlib
+import io
+import os
+import re
+import weakref
+from collections.abc import Mapping
+from functools import lru_cache
+from urllib.parse import quote,urlencode,urlsplit
+
+
+class FrozenMap(dict):
+
+    """
+    Read-only dict used for headers and query params.
+    Equal maps are interned, so thousands of requests built from the same template share one instance.
+    """
+
+    __slots__ = ("_hash","_key","__weakref__")
+
+    def _readonly(self,*args,**kwargs):
+        raise TypeError("HttpRequest headers and query params are immutable")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(frozenset(self.items()))
+            return self._hash
+
+    def __reduce__(self):
+        return (FrozenMap,(dict(self),))
+
+    def typed_key(self):
+
+        """ Interning key of the map, see typed_items(). Raises TypeError for unhashable values. """
+
+        try:
+            return self._key
+        except AttributeError:
+            self._key = typed_items(self)
+            return self._key
+
+
+def typed_items(mapping):
+
+    # 1, 1.0 and True are equal dict keys but encode differently, so the types are part of the key.
+    # Order is kept too: the query string and header block are sent in insertion order.
+    return tuple((type(key),key,type(value),value) for key,value in mapping.items())
+
+
+_interned_maps = weakref.WeakValueDictionary()
+
+
+def freeze_map(mapping):
+
+    if type(mapping) is FrozenMap:
+        return mapping
+    key = typed_items(mapping)
+    try:
+        frozen = _interned_maps.get(key)
+    except TypeError:
+        return FrozenMap(mapping)   # Unhashable values can't be interned, but are still frozen
+
+    if frozen is None:
+        frozen = FrozenMap(mapping)
+        frozen._key = key
+        _interned_maps[key] = frozen
+    return frozen
+
+
+EMPTY_MAP = freeze_map({})
+
+
+## Wire encoding helpers (memoized: the same urls and query maps repeat across requests)
+
+@lru_cache(maxsize=4096)
+def split_url(url):
+
+    """ Returns (scheme, host, port, host_header, path_and_query) for an http(s) url. """
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower() or "http"
+    default_port = 443 if scheme == "https" else 80
+    port = parts.port or default_port
+    host_header = parts.hostname if port == default_port else f"{parts.hostname}:{port}"
+    path = quote(parts.path or "/",safe="/%:@!$&'()*+,;=-._~")
+
+    return scheme,parts.hostname,port,host_header,(f"{path}?{parts.query}" if parts.query else path)
+
+
+@lru_cache(maxsize=4096)
+def _encode_query_cached(key):
+    return urlencode([(name,value) for _,name,_,value in key],doseq=True)
+
+
+def encode_query(query_params):
+
+    if not query_params:
+        return ""
+    try:
+        key = query_params.typed_key() if type(query_params) is FrozenMap else typed_items(query_params)
+        return _encode_query_cached(key)
+    except TypeError:
+        return urlencode(query_params,doseq=True)     # unhashable values: encode without caching
+
+
+## Header checks: a CR or LF in a header would let the caller inject extra header lines
+
+_legal_header_name = re.compile(r"[^:\s][^:\r\n\0]*").fullmatch
+_illegal_header_value = re.compile(r"[\r\n\0]").search
+
+
+def check_header(name,value):
+
+    if not _legal_header_name(name):
+        raise ValueError(f"Invalid header name {name!r}")
+    if _illegal_header_value(value):
+        raise ValueError(f"Invalid header value {value!r} for {name}")
+
+
+## Streaming bodies: file objects, iterables of bytes and buffers such as mmap are sent in chunks
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def is_stream_body(body):
+
+    """
+    True for file objects, buffers (mmap, memoryview) and iterables of bytes, False for
+    str/bytes/bytearray/None. Mappings and scalars (a dict, a number) raise TypeError.
+    """
+
+    if body is None or isinstance(body,(str,bytes,bytearray)):
+        return False
+    if isinstance(body,Mapping):
+        raise TypeError(f"Request body can't be a mapping ({type(body).__name__}); encode it first, e.g. json.dumps()")
+    if hasattr(body,"read") or hasattr(body,"__iter__"):
+        return True
+    try:
+        memoryview(body).release()
+    except TypeError:
+        raise TypeError(f"Request body must be str, bytes, a file object, an iterable of bytes "
+                        f"or a buffer, not {type(body).__name__}") from None
+    return True
+
+
+def stream_length(body):
+
+    """ Size of a streaming body when it can be known up front, else None (sent chunked). """
+
+    try:
+        with memoryview(body) as view:
+            return view.nbytes      # mmap, memoryview and other buffers
+    except TypeError:
+        pass
+
+    if isinstance(body,io.TextIOBase):
+        return None     # fstat counts bytes on disk, not the encoded characters read() returns
+    if hasattr(body,"read"):
+        try:
+            return os.fstat(body.fileno()).st_size - body.tell()
+        except (AttributeError,OSError,ValueError,io.UnsupportedOperation):
+            return None
+    return None
+
+
+def iter_stream(body,chunk_size=STREAM_CHUNK_SIZE):
+
+    try:
+        view = memoryview(body).cast("B")
+    except TypeError:
+        view = None
+
+    if view is not None:
+        for offset in range(0,len(view),chunk_size):
+            yield view[offset:offset + chunk_size]     # slices of the mapping, nothing is copied
+    elif hasattr(body,"read"):
+        read = body.read
+        while True:
+            chunk = read(chunk_size)
+            if not chunk:
+                break
+            yield chunk.encode("utf-8") if isinstance(chunk,str) else chunk
+    else:
+        for chunk in body:
+            yield chunk.encode("utf-8") if isinstance(chunk,str) else chunk
+
+
+def _canonical_key(item):
+    return str(item[0]),type(item[0]).__name__
+
+
 class HttpRequest:
 
+    __slots__ = ("url","method","headers","query_params","body","timeout","_wire_head","_wire_body","_body_length","_fingerprint")
+
     def __init__(self,builder):
 
-        self.url = builder.url
-        self.method = builder.http_method
-        self.headers = builder.headers
-        self.query_params = builder.query_params
-        self.body = builder.http_body
-        self.timeout = builder.http_timeout
-    
+        self._assign(builder.url,builder.http_method,freeze_map(builder.headers),
+                     freeze_map(builder.query_params),builder.http_body,builder.http_timeout)
+
+    def _assign(self,url,method,headers,query_params,body,timeout):
+
+        _set = object.__setattr__
+        _set(self,"url",url)
+        _set(self,"method",method)
+        _set(self,"headers",headers)
+        _set(self,"query_params",query_params)
+        _set(self,"body",body)
+        _set(self,"timeout",timeout)
+        _set(self,"_wire_head",None)
+        _set(self,"_wire_body",None)
+        _set(self,"_body_length",None)
+        _set(self,"_fingerprint",None)
+
+    @classmethod
+    def _from_parts(cls,url,method,headers,query_params,body,timeout):
+
+        # Skips the builder entirely; headers/query_params must already be frozen
+        request = object.__new__(cls)
+        request._assign(url,method,headers,query_params,body,timeout)
+        return request
+
+    def __setattr__(self,name,value):
+        raise AttributeError(f"HttpRequest is immutable, use derive() to change {name}")
+
+    def __delattr__(self,name):
+        raise AttributeError(f"HttpRequest is immutable, {name} can't be deleted")
+
+    def address(self):
+
+        scheme,host,port,_,_ = split_url(self.url)
+        return scheme,host,port
+
+    def fingerprint(self):
+
+        """
+        Canonical identity of the request: method, url, query params and headers,
+        independent of insertion order and header-name case. Used as a response cache key.
+        """
+
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            # Keys are compared as (str, type name), like wire_head() writes them, so mixed key types sort
+            canonical = "\n".join([
+                self.method.upper(),
+                self.url,
+                encode_query(dict(sorted(self.query_params.items(),key=_canonical_key))),
+                *sorted(f"{str(key).lower()}:{type(key).__name__}:{value}" for key,value in self.headers.items()),
+            ])
+            fingerprint = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+            object.__setattr__(self,"_fingerprint",fingerprint)
+        return fingerprint
+
+    def wire_body(self):
+
+        body = self._wire_body
+        if body is None:
+            if self.body is None or is_stream_body(self.body):
+                body = b""      # streaming bodies are sent through iter_wire_body()
+            elif isinstance(self.body,str):
+                body = self.body.encode("utf-8")
+            else:
+                body = bytes(self.body)
+            object.__setattr__(self,"_wire_body",body)
+        return body
+
+    def wire_head(self):
+
+        """ The HTTP/1.1 request line and header block, encoded once and cached on the request. """
+
+        head = self._wire_head
+        if head is None:
+
+            _,_,_,host_header,target = split_url(self.url)
+            query = encode_query(self.query_params)
+            if query:
+                target = f"{target}&{query}" if "?" in target else f"{target}?{query}"
+
+            lines = [f"{self.method} {target} HTTP/1.1"]
+            given = {}      # lowercased name -> value, for the headers this method might add itself
+            for key,value in self.headers.items():
+                key,value = str(key),str(value)
+                check_header(key,value)
+                lines.append(f"{key}: {value}")
+                if key.lower() in ("host","content-length","transfer-encoding"):
+                    given[key.lower()] = value.strip()
+            if "host" not in given:
+                lines.insert(1,f"Host: {host_header}")
+
+            framing = self._framing(given.get("content-length"),given.get("transfer-encoding"))
+            if framing:
+                lines.append(framing)
+            lines.append("\r\n")
+
+            head = "\r\n".join(lines).encode("latin-1")
+            object.__setattr__(self,"_wire_head",head)
+        return head
+
+    def _framing(self,content_length,transfer_encoding):
+
+        """
+        Returns the framing header to add, or None when there is no body or the caller set a
+        matching one. A caller-set header that contradicts the body raises ValueError.
+        """
+
+        if content_length is not None and transfer_encoding is not None:
+            raise ValueError("A request can't set both Content-Length and Transfer-Encoding")
+
+        if is_stream_body(self.body):
+            length = stream_length(self.body)
+            if transfer_encoding is not None:
+                if transfer_encoding.lower() != "chunked":
+                    raise ValueError(f"Unsupported Transfer-Encoding {transfer_encoding!r}, only chunked is")
+                return None     # _body_length stays None: sent chunked
+            if content_length is not None:
+                given = int(content_length)
+                if length is not None and given != length:
+                    raise ValueError(f"Content-Length {given} doesn't match the {length}-byte body")
+                object.__setattr__(self,"_body_length",given)
+                return None
+            object.__setattr__(self,"_body_length",length)
+            return "Transfer-Encoding: chunked" if length is None else f"Content-Length: {length}"
+
+        if transfer_encoding is not None:
+            raise ValueError("Transfer-Encoding is only supported on streaming bodies")
+        length = None if self.body is None else len(self.wire_body())
+        if content_length is not None:
+            if int(content_length) != (length or 0):
+                raise ValueError(f"Content-Length {content_length} doesn't match the {length or 0}-byte body")
+            return None
+        return None if length is None else f"Content-Length: {length}"
+
+    def has_stream_body(self):
+        return is_stream_body(self.body)
+
+    def iter_wire_body(self,chunk_size=STREAM_CHUNK_SIZE):
+
+        """
+        Yields the body as it goes on the wire, in constant memory: Content-Length framing
+        when the size is known, chunked transfer encoding otherwise.
+        A streaming body (file, iterator) can only be consumed once.
+        """
+
+        if not self.has_stream_body():
+            body = self.wire_body()
+            if body:
+                yield body
+            return
+
+        self.wire_head()    # computes the framing
+        length = self._body_length
+
+        if length is None:
+            for chunk in iter_stream(self.body,chunk_size):
+                if chunk:
+                    yield b"%x\r\n" % len(chunk)
+                    yield chunk
+                    yield b"\r\n"
+            yield b"0\r\n\r\n"
+            return
+
+        remaining = length
+        for chunk in iter_stream(self.body,chunk_size):
+            if len(chunk) >= remaining:
+                yield chunk[:remaining]
+                return
+            remaining -= len(chunk)
+            yield chunk
+        if remaining:
+            raise ValueError(f"Request body ended {remaining} bytes short of its Content-Length")
+
+    def write_into(self,buffer):
+
+        """
+        Writes the encoded request into a reusable bytearray (grown if needed) and returns
+        a memoryview over the written bytes. Release the view before reusing the buffer.
+        A streaming body is not included; send it with iter_wire_body().
+        """
+
+        head = self.wire_head()
+        body = self.wire_body()
+        head_size = len(head)
+        size = head_size + len(body)
+
+        if len(buffer) < size:
+            buffer.extend(bytes(size - len(buffer)))
+
+        view = memoryview(buffer)
+        view[:head_size] = head
+        view[head_size:size] = body
+        return view[:size]
+
+    def derive(self):
+
+        # A builder seeded from this request; unchanged maps stay shared with it
+        builder = HttpRequest.Builder(self.url)
+        builder.http_method = self.method
+        builder.headers = self.headers
+        builder.query_params = self.query_params
+        builder.http_body = self.body
+        builder.http_timeout = self.timeout
+        return builder
+
     def __str__(self):
         return (f"HttpRequest(url={self.url}, method={self.method}, headers={self.headers}, "
                 f"query_params={self.query_params}, body={self.body}, timeout={self.timeout})")
 
     class Builder:
 
+        """
+        headers/query_params start out as shared FrozenMaps and are only copied
+        into a private dict on the first add_header/add_query_param (copy-on-write).
+        """
+
         def __init__(self,url):
             
             self.url = url
             self.http_method = "GET"
-            self.headers = {}
-            self.query_params = {}
+            self.headers = EMPTY_MAP
+            self.query_params = EMPTY_MAP
             self.http_body = None
             self.http_timeout = 300
         
@@ -114,14 +515,21 @@ class HttpRequest:
         
         def add_header(self,key,value):
 
+            if type(self.headers) is FrozenMap:
+                self.headers = dict(self.headers)
             self.headers[key] = value
             return self
         
         def add_query_param(self,key,value):
+
+            if type(self.query_params) is FrozenMap:
+                self.query_params = dict(self.query_params)
             self.query_params[key] = value
             return self
         
         def body(self,body):
+            # str/bytes, or a streaming body: file object, iterable of bytes, mmap/memoryview
+            is_stream_body(body)    # raises TypeError for anything else
             self.http_body = body
             return self
         
@@ -129,8 +537,64 @@ class HttpRequest:
             self.http_timeout = timeout
             return self
 
+        def copy(self):
+
+            # Freezing here lets both builders keep sharing the maps until one of them writes
+            self.headers = freeze_map(self.headers)
+            self.query_params = freeze_map(self.query_params)
+
+            builder = HttpRequest.Builder(self.url)
+            builder.http_method = self.http_method
+            builder.headers = self.headers
+            builder.query_params = self.query_params
+            builder.http_body = self.http_body
+            builder.http_timeout = self.http_timeout
+            return builder
+
         def build(self):
             return HttpRequest(self)
+
+        @staticmethod
+        def build_many(template,param_rows):
+
+            """
+            Builds one request per row from a shared template (a Builder or an HttpRequest).
+            A row is a dict with any of: "path" (appended to the url), "query_params" and
+            "headers" (merged over the template's), "body".
+            The template's maps are frozen once, and equal merged maps are shared between rows.
+            """
+
+            if isinstance(template,HttpRequest):
+                template = template.derive()
+
+            base_url = template.url
+            method = template.http_method
+            headers = freeze_map(template.headers)
+            query_params = freeze_map(template.query_params)
+            body = template.http_body
+            is_stream_body(body)
+            timeout = template.http_timeout
+
+            make = HttpRequest._from_parts
+            requests = []
+            append = requests.append
+
+            for row in param_rows:
+
+                path = row.get("path")
+                row_query = row.get("query_params")
+                row_headers = row.get("headers")
+                row_body = row.get("body",body)
+                if row_body is not body:
+                    is_stream_body(row_body)    # raises TypeError, as body() does
+
+                append(make(base_url + path if path else base_url,
+                            method,
+                            freeze_map({**headers,**row_headers}) if row_headers else headers,
+                            freeze_map({**query_params,**row_query}) if row_query else query_params,
+                            row_body,
+                            timeout))
+            return requests
     
 
 if __name__ == "__main__":
@@ -157,4 +621,49 @@ if __name__ == "__main__":
     print(req2)
     print(req3)
 
+    ## Deriving from a template: unchanged fields and maps are shared, not copied
+
+    base = HttpRequest.Builder("https://api.example.com/config") \
+        .add_header("X-API-Key", "secret") \
+        .add_query_param("env", "prod")
+
+    req4 = base.copy().method("POST").body("other_payload").build()
+    req5 = req3.derive().add_query_param("region", "eu").build()
+    req6 = req3.derive().timeout(1000).build()
+
+    print(req4)
+    print(req5)
+    print(req6)
+    print("Headers shared between req3 and req6:", req3.headers is req6.headers)
+
+    ## Building a batch of similar requests in one call
+
+    import time
+
+    rows = [{"path": f"/{i}", "query_params": {"page": i % 10}} for i in range(100_000)]
+    template = HttpRequest.Builder("https://api.example.com/items").add_header("X-API-Key", "secret")
+
+    start = time.perf_counter()
+    for row in rows:
+        b = template.copy()
+        b.url += row["path"]
+        b.add_query_param("page", row["query_params"]["page"]).build()
+    chained = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = HttpRequest.Builder.build_many(template, rows)
+    vectorized = time.perf_counter() - start
+
+    print(batch[42])
+    print(f"Chained builders: {chained*1000:.1f} ms, build_many: {vectorized*1000:.1f} ms for {len(rows)} requests")
+
+    ## Wire encoding: computed once per request, written into one reusable buffer
+
+    buffer = bytearray(4096)
+    for request in (req3, req5):
+        view = request.write_into(buffer)
+        print(bytes(view).decode())
+        view.release()
+
+
 
@@ -19,9 +19,11 @@ class NotificationService:
         email.send(mesg)
 
 
-not1 = NotificationService()
+if __name__ == "__main__":
 
-not1.send_notification("Hii Mary,")
+    not1 = NotificationService()
+
+    not1.send_notification("Hii Mary,")
 
 ## 2. Notification System (Email,SMS,Push,Slack,WhatsApp) V2 class
 
@@ -57,14 +59,9 @@ class SimpleNotificationFactory:
 
     def create_instance(type):
 
-        if type == "email":
-            return EmailNotification()
-
-        elif type == "sms":
-            return SMSNotification()
-
-        elif type == "push":
-            return PushNotification()
+        # Was an if/elif chain returning None for unknown types; now an O(1) registry lookup
+        # (see NotificationChannelRegistry below) that raises ValueError for unknown types
+        return channel_registry.create_notification(type)
     
     def send(self,type,mesg):
         notifi = SimpleNotificationFactory.create_instance(type)
@@ -104,6 +101,11 @@ class Notification(ABC):
     def send(self,message):
         pass
 
+    def send_batch(self,messages):
+        # Channels whose provider has a bulk API override this; the default sends one by one
+        for message in messages:
+            self.send(message)
+
 # Concrete Products
 class EmailNotification(Notification):
 
@@ -111,6 +113,10 @@ class EmailNotification(Notification):
 
         print(f"Sending Email with subject {message}")
 
+    def send_batch(self,messages):
+
+        print(f"Sending {len(messages)} Emails in one batch, first subject {messages[0]}")
+
 class SMSNotification(Notification):
 
     def send(self,message):
@@ -134,6 +140,19 @@ class NotificationCreator(ABC):
         notify = self.create_notification()
         notify.send(mesg)
 
+    def send_many(self,messages,batch_size=100):
+
+        # One product for the whole run, handed the messages batch_size at a time
+        notify = self.create_notification()
+        batch = []
+        for mesg in messages:
+            batch.append(mesg)
+            if len(batch) >= batch_size:
+                notify.send_batch(batch)
+                batch = []
+        if batch:
+            notify.send_batch(batch)
+
 #Concrete Creators
 
 class EmailNotificationCreator(NotificationCreator):
@@ -150,13 +169,176 @@ class PushNotificationCreator(NotificationCreator):
         return PushNotification()
     
 
-email_creator = EmailNotificationCreator()
-email_creator.send("Welcome to Gmail")
+if __name__ == "__main__":
+
+    email_creator = EmailNotificationCreator()
+    email_creator.send("Welcome to Gmail")
+
+    sms_creator = SMSNotificationCreator()
+    sms_creator.send("Sent a SMS")
+
+    push_creator = PushNotificationCreator()
+    push_creator.send("sent a push notify")
+
+
+#========================== Channel Registry ==================
+
+"""
+Adding a channel should not mean editing a factory or importing every channel up front.
+The registry maps a channel name to its creator:
+
+    . Built-in channels are registered directly.
+    . Other channels are registered lazily as "module:CreatorClass" strings, or discovered from the
+      "design_patterns.notification_channels" entry point group of installed packages.
+      Their module is only imported the first time the channel is used.
+    . Lookups of an already loaded channel are a single dict access.
+
+A plugin package declares its channel in its packaging metadata, e.g. in pyproject.toml:
+
+    [project.entry-points."design_patterns.notification_channels"]
+    whatsapp = "whatsapp_channel:WhatsAppNotificationCreator"
+"""
+
+import importlib
+import threading
+
+NOTIFICATION_CHANNEL_GROUP = "design_patterns.notification_channels"
+
+
+class NotificationChannelRegistry:
+
+    def __init__(self,entry_point_group=NOTIFICATION_CHANNEL_GROUP):
+
+        self.entry_point_group = entry_point_group
+        self._creators = {}     # name -> loaded NotificationCreator instance
+        self._specs = {}        # name -> "module:attr" string or EntryPoint, not imported yet
+        self._entry_points_scanned = False
+        self._lock = threading.Lock()
+
+    def register(self,name,creator):
+
+        # creator: a NotificationCreator subclass or instance
+        with self._lock:
+            self._specs.pop(name,None)
+            self._creators[name] = self._instantiate(name,creator)
+
+    def register_lazy(self,name,spec):
+
+        with self._lock:
+            self._creators.pop(name,None)
+            self._specs[name] = spec
+
+    def get_creator(self,name):
+
+        creator = self._creators.get(name)
+        if creator is None:
+            creator = self._load(name)
+        return creator
+
+    def create_notification(self,name):
+        return self.get_creator(name).create_notification()
+
+    def send_many(self,messages,batch_size=100):
+
+        """
+        messages: iterable of (channel, message). Messages are grouped per channel and handed to
+        the channel's product batch_size at a time, so memory stays bounded by one batch per channel.
+        Returns the number of messages sent per channel.
+        """
+
+        products = {}
+        batches = {}
+        counts = {}
+
+        for channel,mesg in messages:
+            batch = batches.get(channel)
+            if batch is None:
+                products[channel] = self.create_notification(channel)
+                batch = batches[channel] = []
+                counts[channel] = 0
+            batch.append(mesg)
+            if len(batch) >= batch_size:
+                products[channel].send_batch(batch)
+                counts[channel] += len(batch)
+                batches[channel] = []
+
+        for channel,batch in batches.items():
+            if batch:
+                products[channel].send_batch(batch)
+                counts[channel] += len(batch)
+        return counts
+
+    def names(self):
+
+        with self._lock:
+            self._scan_entry_points()
+            return sorted(self._creators.keys() | self._specs.keys())
+
+    def _load(self,name):
+
+        with self._lock:
+            creator = self._creators.get(name)
+            if creator is not None:
+                return creator
+
+            if name not in self._specs:
+                self._scan_entry_points()
+            spec = self._specs.get(name)
+            if spec is None:
+                raise ValueError(f"No notification channel registered for: {name}")
+
+            if isinstance(spec,str):
+                module_name,_,attr = spec.partition(":")
+                target = getattr(importlib.import_module(module_name),attr)
+            else:
+                target = spec.load()
+
+            creator = self._creators[name] = self._instantiate(name,target)
+            del self._specs[name]
+            return creator
+
+    def _scan_entry_points(self):
+
+        # Reading installed package metadata is slow, so it happens once, on the first unknown name
+        if self._entry_points_scanned:
+            return
+        self._entry_points_scanned = True
+
+        from importlib.metadata import entry_points     # imported here: it's slow to import too
+        for entry_point in entry_points(group=self.entry_point_group):
+            if entry_point.name not in self._creators:
+                self._specs.setdefault(entry_point.name,entry_point)
+
+    @staticmethod
+    def _instantiate(name,creator):
+
+        if isinstance(creator,type):
+            creator = creator()
+        if not isinstance(creator,NotificationCreator):
+            raise TypeError(f"Channel {name} must provide a NotificationCreator, got {type(creator).__name__}")
+        return creator
+
+
+channel_registry = NotificationChannelRegistry()
+channel_registry.register("email",EmailNotificationCreator)
+channel_registry.register("sms",SMSNotificationCreator)
+channel_registry.register("push",PushNotificationCreator)
+
+
+if __name__ == "__main__":
+
+    SimpleNotificationFactory().send("email","Hello via the registry")
+    channel_registry.get_creator("push").send("Registry push")
+
+    try:
+        SimpleNotificationFactory.create_instance("carrier_pigeon")
+    except ValueError as error:
+        print(error)
 
-sms_creator = SMSNotificationCreator()
-sms_creator.send("Sent a SMS")
+    print("Known channels:",channel_registry.names())
 
-push_creator = PushNotificationCreator()
-push_creator.send("sent a push notify")
+    # Batched sends: email batches through its bulk API, sms and push fall back to per-message sends
+    campaign = [("email",f"Newsletter #{i}") for i in range(250)] + [("sms",f"Code {i}") for i in range(3)]
+    print(channel_registry.send_many(campaign,batch_size=100))
 
 
@@ -0,0 +1,811 @@
+# Real-World Usage of the Factory Method: dispatching notifications without one slow channel blocking the rest
+
+"""
+NotificationDispatcher sits in front of the NotificationCreator family (factory_method.py):
+
+    . Every channel gets its own bounded queue and its own workers, so a slow SMS provider
+      only fills the SMS queue while email and push keep flowing.
+    . The number of workers per channel caps its concurrency. Blocking send() calls run on a
+      thread pool owned by the channel; a product with an async send() is awaited directly.
+    . When a channel's queue is full, dispatch() either waits for room (backpressure) or,
+      with block=False or an expired timeout, raises QueueFullError.
+    . metrics() reports queue depth and enqueue-to-sent latency per channel.
+    . Optional token buckets shape throughput per channel and per recipient. A message over
+      its recipient's limit is parked in a time-ordered heap until a token is due, and lets
+      other messages go first; when the channel's bucket is empty, its workers wait for the
+      next token. Nothing is failed for being over a limit, but dispatch() applies
+      backpressure to a recipient with recipient_backlog messages already waiting.
+    . Messages carry a priority (URGENT, HIGH, NORMAL, BULK) and an optional deadline.
+      Each channel keeps one bounded FIFO per priority, and workers always serve the most
+      urgent non-empty level, so an OTP never waits behind a marketing backlog and a bulk
+      flood can't fill the room urgent messages need. A message still queued past its
+      deadline is dropped with DeadlineExceededError. Latency percentiles are kept per priority.
+    . Optional coalescing per channel: messages to the same recipient within the channel's
+      window are merged into one digest and sent with one provider call. Open digests are
+      indexed by the time bucket they are due in, so a flush only touches the digests it sends.
+      Open digests count against the channel's queue bound and each channel flushes its own.
+      URGENT messages are never held back for a digest.
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import time
+from collections import OrderedDict,deque
+from concurrent.futures import ThreadPoolExecutor
+
+from factory_method import channel_registry
+
+
+URGENT,HIGH,NORMAL,BULK = range(4)
+PRIORITY_NAMES = ("urgent","high","normal","bulk")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class DeadlineExceededError(Exception):
+    pass
+
+
+def percentile(sorted_samples,fraction):
+
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1,int(fraction * len(sorted_samples)))
+    return sorted_samples[index]
+
+
+def latency_summary(samples):
+
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "avg_ms": (sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+        "p50_ms": percentile(ordered,0.50) * 1000,
+        "p95_ms": percentile(ordered,0.95) * 1000,
+        "p99_ms": percentile(ordered,0.99) * 1000,
+        "max_ms": (ordered[-1] * 1000) if ordered else 0.0,
+    }
+
+
+class TokenBucket:
+
+    """
+    rate tokens per second, up to burst. Refilled lazily from the elapsed time: O(1) per message.
+    take() reserves a token even when none is left. The balance goes negative, so callers that
+    find it empty are given consecutive slots instead of all retrying at the same instant.
+    """
+
+    __slots__ = ("rate","burst","tokens","updated")
+
+    def __init__(self,rate,burst,now):
+
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self,now):
+
+        """ Reserves a token. Returns 0.0 if it can be used now, else the seconds until it is due. """
+
+        tokens = self.tokens + (now - self.updated) * self.rate
+        tokens = (tokens if tokens < self.burst else self.burst) - 1
+        self.tokens = tokens
+        self.updated = now
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def is_full(self,now):
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class RecipientBuckets:
+
+    """
+    One TokenBucket per recipient, least recently used first. A bucket that has refilled to
+    burst holds no state worth keeping, so idle recipients are dropped as the front is passed.
+    """
+
+    def __init__(self,rate,burst):
+
+        self.rate = rate
+        self.burst = burst
+        self._buckets = OrderedDict()
+
+    def take(self,recipient,now):
+
+        bucket = self._buckets.get(recipient)
+        if bucket is None:
+            bucket = self._buckets[recipient] = TokenBucket(self.rate,self.burst,now)
+        else:
+            self._buckets.move_to_end(recipient)
+
+        # Amortized O(1): every bucket is evicted at most once per time it is created
+        while len(self._buckets) > 1:
+            oldest = next(iter(self._buckets.values()))
+            if not oldest.is_full(now):
+                break
+            self._buckets.popitem(last=False)
+
+        return bucket.take(now)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class PriorityQueues:
+
+    """ One bounded FIFO per priority level. get() returns from the most urgent non-empty level. """
+
+    def __init__(self,maxsize,levels=len(PRIORITY_NAMES)):
+
+        self.levels = [asyncio.Queue(maxsize=maxsize) for _ in range(levels)]
+        self._available = asyncio.Semaphore(0)      # counts queued items across all levels
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    async def put(self,priority,item):
+
+        await self.levels[priority].put(item)
+        self._added()
+
+    def put_nowait(self,priority,item):
+
+        self.levels[priority].put_nowait(item)
+        self._added()
+
+    async def get(self):
+
+        await self._available.acquire()
+        for level in self.levels:
+            if not level.empty():
+                return level.get_nowait()
+
+    def task_done(self):
+
+        self._unfinished -= 1
+        if not self._unfinished:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
+
+    def qsize(self):
+        return sum(level.qsize() for level in self.levels)
+
+    def _added(self):
+
+        self._unfinished += 1
+        self._finished.clear()
+        self._available.release()
+
+
+class Digest:
+
+    __slots__ = ("channel","recipient","messages","priority","deadline","created_at","delivered")
+
+    def __init__(self,channel,recipient,priority,deadline,delivered):
+
+        self.channel = channel
+        self.recipient = recipient
+        self.messages = []
+        self.priority = priority
+        self.deadline = deadline
+        self.created_at = time.perf_counter()
+        self.delivered = delivered
+
+    def add(self,message,priority,deadline):
+
+        self.messages.append(message)
+        if priority < self.priority:
+            self.priority = priority
+        # The digest must be sent while any of its messages still wants it
+        if self.deadline is not None:
+            self.deadline = None if deadline is None else max(self.deadline,deadline)
+
+
+class DigestIndex:
+
+    """
+    Open digests by (channel, recipient), plus a time-bucketed index of when each is due.
+    Buckets are resolution seconds wide; a heap holds the ids of non-empty buckets, so
+    pop_due() costs O(digests flushed), independent of how many digests are still open.
+    """
+
+    def __init__(self,resolution=0.1):
+
+        self.resolution = resolution
+        self._open = {}         # (channel, recipient) -> Digest
+        self._buckets = {}      # bucket id -> [Digest]
+        self._due = []          # heap of bucket ids
+
+    def get(self,channel,recipient):
+        return self._open.get((channel,recipient))
+
+    def add(self,channel,recipient,message,priority,deadline,window,loop):
+
+        """ Adds the message to the recipient's open digest. Returns (digest, digest created). """
+
+        digest = self._open.get((channel,recipient))
+        created = digest is None
+        if created:
+            digest = Digest(channel,recipient,priority,deadline,loop.create_future())
+            self._open[(channel,recipient)] = digest
+
+            bucket = -int(-(time.monotonic() + window) // self.resolution)     # rounded up
+            digests = self._buckets.get(bucket)
+            if digests is None:
+                digests = self._buckets[bucket] = []
+                heapq.heappush(self._due,bucket)
+            digests.append(digest)
+
+        digest.add(message,priority,deadline)
+        return digest,created
+
+    def detach(self,digest):
+
+        # Taken out to be sent early; its stale bucket entry is skipped by pop_due()
+        del self._open[(digest.channel,digest.recipient)]
+
+    def next_due(self):
+        return self._due[0] * self.resolution if self._due else None
+
+    def pop_due(self,now):
+
+        flushed = []
+        while self._due and self._due[0] * self.resolution <= now:
+            for digest in self._buckets.pop(heapq.heappop(self._due)):
+                key = (digest.channel,digest.recipient)
+                if self._open.get(key) is digest:
+                    del self._open[key]
+                    flushed.append(digest)
+        return flushed
+
+    def pop_all(self):
+        return self.pop_due(float("inf"))
+
+    def __len__(self):
+        return len(self._open)
+
+
+def default_digest(messages):
+    return messages[0] if len(messages) == 1 else f"{len(messages)} new notifications:\n" + "\n".join(map(str,messages))
+
+
+class Coalescer:
+
+    """
+    Open digests of one channel and the task that flushes them into that channel's queue.
+
+    Open digests count against the channel's queue bound: a message that needs a new digest
+    when max_open are already open waits for room (block/timeout) or raises QueueFullError,
+    like a full queue. A digest that reaches max_messages is sent early. Each channel flushes
+    on its own task, so a channel whose queue is full only holds back its own digests.
+    """
+
+    def __init__(self,queue,window,digest,max_open,max_messages):
+
+        self.queue = queue
+        self.window = window
+        self.digest = digest
+        self.max_open = max_open
+        self.max_messages = max_messages
+
+        self.index = DigestIndex()
+        self.merged = 0
+        self.sent = 0
+
+        self._ready = deque()       # digests taken out of the index, waiting to be put on the queue
+        self._sending = None
+        self._added = asyncio.Event()
+        self._room = asyncio.Event()
+        self._closing = False
+        self._flusher = None
+
+    def open_digests(self):
+        return len(self.index) + len(self._ready) + (self._sending is not None)
+
+    async def add(self,recipient,message,priority,deadline,block,timeout):
+
+        name = self.queue.name
+        if self.index.get(name,recipient) is None and self.open_digests() >= self.max_open:
+            await self._wait_for_room(recipient,block,timeout)
+
+        digest,created = self.index.add(name,recipient,message,priority,deadline,self.window,
+                                        asyncio.get_running_loop())
+        if created:
+            digest.delivered.add_done_callback(_mark_retrieved)
+        self.merged += 1
+
+        if len(digest.messages) >= self.max_messages:
+            self.index.detach(digest)
+            self._ready.append(digest)
+
+        if self._flusher is None:
+            self._flusher = asyncio.ensure_future(self._flush())
+        self._added.set()
+        return digest.delivered
+
+    async def stop(self,drain):
+
+        if self._flusher is None:
+            return
+        if drain:
+            self._closing = True
+            self._added.set()
+            await self._flusher
+        else:
+            pending = [*self.index.pop_all(),*self._ready] + ([self._sending] if self._sending else [])
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher,return_exceptions=True)
+            for digest in pending:
+                digest.delivered.cancel()
+        self._flusher = None
+
+    async def _wait_for_room(self,recipient,block,timeout):
+
+        if not block:
+            self.queue.rejected += 1
+            raise QueueFullError(f"Channel {self.queue.name} has {self.max_open} digests open")
+
+        async def room():
+            while self.index.get(self.queue.name,recipient) is None and self.open_digests() >= self.max_open:
+                self._room.clear()
+                await self._room.wait()
+
+        try:
+            await asyncio.wait_for(room(),timeout)
+        except asyncio.TimeoutError:
+            self.queue.rejected += 1
+            raise QueueFullError(f"Channel {self.queue.name} kept {self.max_open} digests open for {timeout}s") from None
+
+    async def _flush(self):
+
+        while True:
+            if self._ready:
+                await self._send(self._ready.popleft())
+                continue
+            if self._closing:
+                self._ready.extend(self.index.pop_all())
+                if not self._ready:
+                    return
+                continue
+
+            due = self.index.next_due()
+            delay = None if due is None else due - time.monotonic()
+            if delay is None or delay > 0:
+                # Sleep until the earliest bucket is due, or a new (possibly earlier) one appears
+                self._added.clear()
+                try:
+                    await asyncio.wait_for(self._added.wait(),delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._ready.extend(self.index.pop_due(time.monotonic()))
+
+    async def _send(self,digest):
+
+        item = (self.digest(digest.messages),digest.recipient,digest.created_at,digest.delivered,
+                digest.priority,digest.deadline)
+        self._sending = digest
+        try:
+            await self.queue.put(digest.priority,item,True,None)    # waits on this channel only
+        finally:
+            self._sending = None
+        self.sent += 1
+        self._room.set()
+
+
+class ChannelQueue:
+
+    def __init__(self,name,creator,queue_size,concurrency,latency_window=10_000,
+                 rate_limit=None,recipient_rate_limit=None,recipient_backlog=None):
+
+        """
+        recipient_backlog: with a recipient limit, how many messages one recipient may have queued
+        or parked at once (default a tenth of queue_size). dispatch() applies backpressure beyond it.
+        """
+
+        self.name = name
+        self.creator = creator
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+
+        self.queue = PriorityQueues(queue_size)
+        # seconds, most recent sends only, per priority level
+        self.latencies = [deque(maxlen=latency_window) for _ in PRIORITY_NAMES]
+        self.sent = 0
+        self.expired = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self.deferred = 0
+        self.throttled_seconds = 0.0
+
+        # Throughput shaping: (rate per second, burst) for the channel and for each recipient
+        now = time.monotonic()
+        self.bucket = TokenBucket(*rate_limit,now) if rate_limit else None
+        self.recipient_buckets = RecipientBuckets(*recipient_rate_limit) if recipient_rate_limit else None
+        self._parked = []       # heap of (ready_at, seq, item) held back by a recipient limit
+        self._seq = itertools.count()
+        self.recipient_backlog = recipient_backlog or max(1,queue_size // 10)
+        self._backlog = {}      # recipient -> messages queued or parked, only for rate-limited channels
+        self._room = asyncio.Event()
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency,thread_name_prefix=f"notify-{name}")
+        self._workers = []
+
+    def start(self):
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.concurrency)]
+
+    async def put(self,priority,item,block,timeout):
+
+        recipient = item[1]
+        if self.recipient_buckets is None or recipient is None:
+            await self._put(priority,item,block,timeout)
+            return
+
+        # Over-limit messages are parked, not sent, so they are bounded here rather than by stalling
+        # the workers: per recipient, and in total at queue_size parked messages
+        if not self._has_room(recipient):
+            if not block:
+                self.rejected += 1
+                raise QueueFullError(f"Channel {self.name} already holds {self.recipient_backlog} "
+                                     f"messages for {recipient}")
+            deadline = None if timeout is None else time.monotonic() + timeout
+            try:
+                await asyncio.wait_for(self._wait_for_room(recipient),timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise QueueFullError(f"Channel {self.name} held too many messages for {recipient} "
+                                     f"for {timeout}s") from None
+            timeout = None if deadline is None else max(0.0,deadline - time.monotonic())
+
+        self._backlog[recipient] = self._backlog.get(recipient,0) + 1
+        try:
+            await self._put(priority,item,block,timeout)
+        except BaseException:
+            self._release(recipient)
+            raise
+
+    def _has_room(self,recipient):
+        return self._backlog.get(recipient,0) < self.recipient_backlog and len(self._parked) < self.queue_size
+
+    async def _wait_for_room(self,recipient):
+
+        while not self._has_room(recipient):
+            self._room.clear()
+            await self._room.wait()
+
+    def _release(self,recipient):
+
+        count = self._backlog[recipient] - 1
+        if count:
+            self._backlog[recipient] = count
+        else:
+            del self._backlog[recipient]
+        self._room.set()
+
+    def _done(self,item):
+
+        self.queue.task_done()
+        if self.recipient_buckets is not None and item[1] is not None:
+            self._release(item[1])
+
+    async def _put(self,priority,item,block,timeout):
+
+        if not block:
+            try:
+                self.queue.put_nowait(priority,item)
+            except asyncio.QueueFull:
+                self.rejected += 1
+                raise QueueFullError(f"Channel {self.name} queue is full ({self.queue_size})") from None
+        else:
+            try:
+                await asyncio.wait_for(self.queue.put(priority,item),timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise QueueFullError(f"Channel {self.name} queue stayed full for {timeout}s") from None
+
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    async def stop(self,drain):
+
+        if drain:
+            await self.queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers,return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+        # Not drained: whatever is still queued or parked will never be sent
+        for level in self.queue.levels:
+            while not level.empty():
+                level.get_nowait()[3].cancel()
+        for *_,item in self._parked:
+            item[3].cancel()
+        self._parked.clear()
+
+    def metrics(self):
+
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "expired": self.expired,
+            "rejected": self.rejected,
+            "parked": len(self._parked),
+            "deferred": self.deferred,
+            "throttled_seconds": self.throttled_seconds,
+            "tracked_recipients": len(self.recipient_buckets) if self.recipient_buckets else 0,
+            "latency": latency_summary([sample for level in self.latencies for sample in level]),
+            "latency_by_priority": {PRIORITY_NAMES[priority]: latency_summary(samples)
+                                    for priority,samples in enumerate(self.latencies) if samples},
+        }
+
+    async def _next_item(self):
+
+        """ Returns (item, parked). A parked item already holds its recipient token. """
+
+        # Parked messages whose recipient token is due go before anything new
+        while True:
+            if self._parked:
+                delay = self._parked[0][0] - time.monotonic()
+                if delay <= 0:
+                    self._room.set()
+                    return heapq.heappop(self._parked)[2],True
+                try:
+                    return await asyncio.wait_for(self.queue.get(),delay),False
+                except asyncio.TimeoutError:
+                    continue
+            return await self.queue.get(),False
+
+    async def _shape(self,item,parked):
+
+        """ Returns True when the item may be sent now; False when it was parked for later. """
+
+        recipient = item[1]
+        if not parked and self.recipient_buckets is not None and recipient is not None:
+            now = time.monotonic()
+            wait = self.recipient_buckets.take(recipient,now)
+            if wait:
+                # The token is reserved, so ready_at is exact and the item is parked only once
+                self.deferred += 1
+                heapq.heappush(self._parked,(now + wait,next(self._seq),item))
+                return False
+
+        if self.bucket is not None:
+            wait = self.bucket.take(time.monotonic())
+            if wait:
+                self.throttled_seconds += wait
+                await asyncio.sleep(wait)
+        return True
+
+    async def _work(self):
+
+        loop = asyncio.get_running_loop()
+        notify = self.creator.create_notification()
+        is_async = inspect.iscoroutinefunction(notify.send)
+
+        while True:
+            item,parked = await self._next_item()
+            message,_,enqueued_at,delivered,priority,deadline = item
+
+            if deadline is not None and time.time() > deadline:
+                self.expired += 1
+                if not delivered.done():
+                    delivered.set_exception(DeadlineExceededError(f"{self.name} message missed its deadline"))
+                self._done(item)
+                continue
+
+            try:
+                shaped = await self._shape(item,parked)
+            except asyncio.CancelledError:
+                delivered.cancel()      # stopped without draining
+                raise
+            if not shaped:
+                continue    # parked: _done() is called once it is finally sent
+            try:
+                if is_async:
+                    await notify.send(message)
+                else:
+                    await loop.run_in_executor(self._executor,notify.send,message)
+            except asyncio.CancelledError:
+                delivered.cancel()      # stopped mid-send: whether it went out is unknown
+                raise
+            except Exception as error:
+                self.failed += 1
+                if not delivered.done():
+                    delivered.set_exception(error)
+            else:
+                self.sent += 1
+                self.latencies[priority].append(time.perf_counter() - enqueued_at)
+                if not delivered.done():
+                    delivered.set_result(None)
+            finally:
+                self._done(item)
+
+
+def _mark_retrieved(future):
+    # Callers that fire and forget never look at the future; don't warn about unretrieved errors
+    if not future.cancelled():
+        future.exception()
+
+
+class NotificationDispatcher:
+
+    def __init__(self,registry=channel_registry,queue_size=1000,concurrency=4,channel_limits=None,
+                 rate_limits=None,recipient_rate_limits=None,coalesce_windows=None,digest=default_digest,
+                 digest_max_messages=100):
+
+        """
+        channel_limits: optional {channel: (queue_size, concurrency)} overriding the defaults.
+        rate_limits / recipient_rate_limits: optional {channel: (rate per second, burst)}.
+        coalesce_windows: optional {channel: seconds}; digest(messages) builds the merged message.
+        Up to queue_size digests may be open per channel, each with up to digest_max_messages.
+        """
+
+        self.registry = registry
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+        self.channel_limits = channel_limits or {}
+        self.rate_limits = rate_limits or {}
+        self.recipient_rate_limits = recipient_rate_limits or {}
+        self.coalesce_windows = coalesce_windows or {}
+        self.digest = digest
+        self.digest_max_messages = digest_max_messages
+        self._channels = {}
+        self._coalescers = {}
+
+    async def dispatch(self,channel,message,recipient=None,priority=NORMAL,deadline=None,block=True,timeout=None):
+
+        """
+        Enqueues a message and returns a future that resolves once it has been sent.
+        Waits for queue room when block=True (up to timeout seconds), else raises QueueFullError.
+        deadline is a time.time() timestamp; a message not sent by then is dropped.
+        """
+
+        queue = self._channels.get(channel) or self._open(channel)
+
+        window = self.coalesce_windows.get(channel)
+        if window and recipient is not None and priority != URGENT:
+            coalescer = self._coalescers.get(channel)
+            if coalescer is None:
+                coalescer = self._coalescers[channel] = Coalescer(queue,window,self.digest,queue.queue_size,
+                                                                  self.digest_max_messages)
+            return await coalescer.add(recipient,message,priority,deadline,block,timeout)
+
+        delivered = asyncio.get_running_loop().create_future()
+        delivered.add_done_callback(_mark_retrieved)
+        await queue.put(priority,(message,recipient,time.perf_counter(),delivered,priority,deadline),block,timeout)
+        return delivered
+
+    async def stop(self,drain=True):
+
+        await asyncio.gather(*(coalescer.stop(drain) for coalescer in self._coalescers.values()))
+        self._coalescers.clear()
+
+        await asyncio.gather(*(queue.stop(drain) for queue in self._channels.values()))
+        self._channels.clear()
+
+    def metrics(self):
+
+        metrics = {name: queue.metrics() for name,queue in self._channels.items()}
+        for channel,coalescer in self._coalescers.items():
+            metrics[channel]["coalesced_messages"] = coalescer.merged
+            metrics[channel]["digests_sent"] = coalescer.sent
+            metrics[channel]["open_digests"] = coalescer.open_digests()
+        return metrics
+
+    def _open(self,channel):
+
+        creator = self.registry.get_creator(channel)   # ValueError for unknown channels
+        queue_size,concurrency = self.channel_limits.get(channel,(self.queue_size,self.concurrency))
+        queue = self._channels[channel] = ChannelQueue(
+            channel,creator,queue_size,concurrency,
+            rate_limit=self.rate_limits.get(channel),
+            recipient_rate_limit=self.recipient_rate_limits.get(channel))
+        queue.start()
+        return queue
+
+
+if __name__ == "__main__":
+
+    from factory_method import EmailNotification,NotificationCreator,PushNotification,SMSNotification
+
+    class SlowSMSNotification(SMSNotification):
+
+        def send(self,message):
+            time.sleep(0.2)     # a slow provider
+
+    class QuietEmailNotification(EmailNotification):
+
+        def send(self,message):
+            pass                # a fast provider, kept quiet for the demo
+
+    class SlowSMSNotificationCreator(NotificationCreator):
+        def create_notification(self):
+            return SlowSMSNotification()
+
+    class QuietEmailNotificationCreator(NotificationCreator):
+        def create_notification(self):
+            return QuietEmailNotification()
+
+    class QuietPushNotification(PushNotification):
+
+        def send(self,message):
+            pass
+
+    class QuietPushNotificationCreator(NotificationCreator):
+        def create_notification(self):
+            return QuietPushNotification()
+
+    channel_registry.register("sms",SlowSMSNotificationCreator)
+    channel_registry.register("push",QuietPushNotificationCreator)
+    channel_registry.register("email",QuietEmailNotificationCreator)
+
+    async def main():
+
+        dispatcher = NotificationDispatcher(queue_size=100,concurrency=4,channel_limits={"sms": (10,2)})
+
+        start = time.perf_counter()
+        email_sent = [await dispatcher.dispatch("email",f"Welcome #{i}") for i in range(1000)]
+
+        sms_sent = []
+        for i in range(20):
+            try:
+                sms_sent.append(await dispatcher.dispatch("sms",f"OTP {i}",block=False))
+            except QueueFullError as error:
+                print("Rejected:",error)
+                break
+
+        await asyncio.gather(*email_sent)
+        print(f"1000 emails sent in {time.perf_counter() - start:.2f}s while SMS is still draining")
+
+        await asyncio.gather(*sms_sent)
+        for channel,metrics in dispatcher.metrics().items():
+            print(channel,metrics)
+
+        await dispatcher.stop()
+
+        # Throughput shaping: push is limited to 200/s overall and 2/s (burst 3) per user
+        shaped = NotificationDispatcher(rate_limits={"push": (200,50)},recipient_rate_limits={"push": (2,3)})
+        start = time.perf_counter()
+        pushes = [await shaped.dispatch("push",f"Update {i}",recipient=f"user-{i % 50}") for i in range(300)]
+        pushes.append(await shaped.dispatch("push","Chatty update",recipient="user-0"))
+        await asyncio.gather(*pushes)
+        print(f"300 shaped pushes sent in {time.perf_counter() - start:.2f}s")
+        print("push",shaped.metrics()["push"])
+        await shaped.stop()
+
+        # Priorities: OTPs dispatched after a marketing backlog still go out first
+        prioritized = NotificationDispatcher(queue_size=1000,channel_limits={"sms": (1000,1)})
+        campaign = [await prioritized.dispatch("sms",f"Promo {i}",priority=BULK,deadline=time.time() + 1.0)
+                    for i in range(8)]
+        otps = [await prioritized.dispatch("sms",f"OTP {i}",priority=URGENT,deadline=time.time() + 5)
+                for i in range(3)]
+        await asyncio.gather(*otps)
+        print("OTPs delivered while", prioritized.metrics()["sms"]["queue_depth"], "promos are still queued")
+        results = await asyncio.gather(*campaign,return_exceptions=True)
+        print("Promos past their deadline:",sum(isinstance(r,DeadlineExceededError) for r in results))
+        print("sms latency by priority:",prioritized.metrics()["sms"]["latency_by_priority"])
+        await prioritized.stop()
+
+        # Coalescing: a burst of pushes per user within 0.5s becomes one digest per user
+        coalescing = NotificationDispatcher(coalesce_windows={"push": 0.5})
+        burst = [await coalescing.dispatch("push",f"Like #{i}",recipient=f"user-{i % 3}") for i in range(30)]
+        await asyncio.gather(*burst)
+        metrics = coalescing.metrics()["push"]
+        print(f"{metrics['coalesced_messages']} pushes sent as {metrics['digests_sent']} digests "
+              f"({metrics['sent']} provider calls)")
+        await coalescing.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,279 @@
+# Real-World Usage of the Factory Method: a durable outbox in front of the notification channels
+
+"""
+A send() that is in flight when the process crashes is lost. Sending synchronously would
+fix that but adds the provider's latency to every caller. NotificationOutbox sits in between:
+
+    . enqueue() only appends to an in-memory list and returns at once. A writer thread
+      commits everything appended since its last commit in one sqlite transaction
+      (group commit), in WAL mode. The returned future resolves once the message is durable.
+    . Worker threads claim due rows with a lease and send them through the channel registry
+      (factory_method.py). If a worker dies, its rows are picked up again once the lease expires.
+    . Failed sends are retried with exponential backoff and jitter. After max_attempts they
+      are parked as "dead".
+    . message_id is unique, so enqueueing the same message twice stores and sends it once.
+      Delivery is at-least-once: a crash between send() and marking the row sent re-sends it.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import closing
+
+from factory_method import channel_registry
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id              INTEGER PRIMARY KEY,
+    message_id      TEXT NOT NULL UNIQUE,
+    channel         TEXT NOT NULL,
+    payload         TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',    -- pending | inflight | sent | dead
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,                      -- for inflight rows: when the lease expires
+    last_error      TEXT,
+    created_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def connect(path):
+
+    connection = sqlite3.connect(path,timeout=30,isolation_level=None,check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # NORMAL is crash-safe for the process in WAL mode; use FULL to also survive power loss
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class NotificationOutbox:
+
+    def __init__(self,path,registry=channel_registry,workers=4,batch_size=100,max_attempts=5,
+                 backoff_base=0.5,backoff_max=60.0,lease=30.0,commit_interval=0.005):
+
+        self.path = path
+        self.registry = registry
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.commit_interval = commit_interval
+
+        with closing(connect(path)) as connection:
+            connection.executescript(SCHEMA)
+
+        self._appended = []             # (message_id, channel, payload, future) not yet committed
+        self._append_lock = threading.Lock()
+        self._append_ready = threading.Event()
+        self._work_ready = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+
+        self._stopping.clear()
+        self._threads = [threading.Thread(target=self._write_loop,name="outbox-writer",daemon=True)]
+        self._threads += [threading.Thread(target=self._work_loop,name=f"outbox-worker-{i}",daemon=True)
+                          for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        self._work_ready.set()      # rows left over from a previous run may be due already
+
+    def stop(self,timeout=None):
+
+        # Appended messages are committed before the writer exits; claimed rows finish their batch
+        self._stopping.set()
+        self._append_ready.set()
+        self._work_ready.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self,channel,message,message_id=None):
+
+        """ Never blocks on sqlite or on the provider. The future resolves to the message_id once durable. """
+
+        durable = Future()
+        message_id = message_id or uuid.uuid4().hex
+        with self._append_lock:
+            self._appended.append((message_id,channel,json.dumps(message),durable))
+        self._append_ready.set()
+        return durable
+
+    def stats(self):
+
+        with closing(connect(self.path)) as connection:
+            counts = dict(connection.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+        with self._append_lock:
+            counts["appended"] = len(self._appended)
+        return counts
+
+    def wait_idle(self,timeout=None,poll=0.05):
+
+        """ Waits until nothing is appended, pending or in flight. Returns False on timeout. """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            counts = self.stats()
+            if not counts["appended"] and not counts.get("pending") and not counts.get("inflight"):
+                return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(poll)
+
+    def _write_loop(self):
+
+        connection = connect(self.path)
+        try:
+            while True:
+                self._append_ready.wait()
+                # Let concurrent callers pile up so one commit covers all of them
+                time.sleep(self.commit_interval)
+                self._append_ready.clear()
+
+                with self._append_lock:
+                    appended,self._appended = self._appended,[]
+
+                if appended:
+                    self._commit_appended(connection,appended)
+                elif self._stopping.is_set():
+                    return
+
+                if self._stopping.is_set():
+                    self._append_ready.set()    # keep going until a pass finds nothing left
+        finally:
+            connection.close()
+
+    def _commit_appended(self,connection,appended):
+
+        now = time.time()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT OR IGNORE INTO outbox (message_id, channel, payload, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(message_id,channel,payload,now,now) for message_id,channel,payload,_ in appended])
+            connection.execute("COMMIT")
+        except Exception as error:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            for *_,durable in appended:
+                durable.set_exception(error)
+            return
+
+        for message_id,*_,durable in appended:
+            durable.set_result(message_id)
+        self._work_ready.set()
+
+    def _work_loop(self):
+
+        connection = connect(self.path)
+        try:
+            while not self._stopping.is_set():
+                rows = self._claim(connection)
+                if not rows:
+                    # Nothing due: sleep until new rows are committed or the next retry could be due
+                    self._work_ready.wait(self.backoff_base)
+                    self._work_ready.clear()
+                    continue
+                self._complete(connection,[self._deliver(row) for row in rows])
+        finally:
+            connection.close()
+
+    def _claim(self,connection):
+
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id, channel, payload, attempts FROM outbox "
+                "WHERE status IN ('pending', 'inflight') AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?",(now,self.batch_size)).fetchall()
+            connection.executemany(
+                "UPDATE outbox SET status = 'inflight', next_attempt_at = ? WHERE id = ?",
+                [(now + self.lease,row[0]) for row in rows])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _deliver(self,row):
+
+        row_id,channel,payload,attempts = row
+        try:
+            self.registry.get_creator(channel).create_notification().send(json.loads(payload))
+        except Exception as error:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                return ("dead",attempts,time.time(),repr(error),row_id)
+            backoff = min(self.backoff_max,self.backoff_base * 2 ** (attempts - 1))
+            return ("pending",attempts,time.time() + backoff * random.uniform(0.5,1.0),repr(error),row_id)
+        return ("sent",attempts + 1,time.time(),None,row_id)
+
+    def _complete(self,connection,results):
+
+        # One transaction per claimed batch, however many rows it holds
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                results)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+
+if __name__ == "__main__":
+
+    import os
+    import tempfile
+
+    from factory_method import NotificationCreator,SMSNotification
+
+    class FlakySMSNotification(SMSNotification):
+
+        sent = []
+
+        def send(self,message):
+            if random.random() < 0.3:
+                raise ConnectionError("SMS provider unavailable")
+            FlakySMSNotification.sent.append(message)
+
+    class FlakySMSNotificationCreator(NotificationCreator):
+        def create_notification(self):
+            return FlakySMSNotification()
+
+    channel_registry.register("sms",FlakySMSNotificationCreator)
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        path = os.path.join(directory,"outbox.db")
+
+        # First run "crashes" before any worker sends: the messages are durable but undelivered
+        outbox = NotificationOutbox(path,workers=0)
+        outbox.start()
+        start = time.perf_counter()
+        futures = [outbox.enqueue("sms",f"OTP {i}",message_id=f"otp-{i}") for i in range(1000)]
+        print(f"Enqueued 1000 messages in {(time.perf_counter() - start) * 1000:.1f} ms without blocking")
+        for future in futures:
+            future.result()
+        outbox.stop()
+        print("After crash:",outbox.stats())
+
+        # Second run recovers the backlog; duplicate message ids are ignored
+        outbox = NotificationOutbox(path,backoff_base=0.01)
+        outbox.enqueue("sms","OTP 0",message_id="otp-0")
+        outbox.start()
+        outbox.wait_idle(timeout=30)
+        outbox.stop()
+        print("After recovery:",outbox.stats(),"distinct delivered:",len(set(FlakySMSNotification.sent)))
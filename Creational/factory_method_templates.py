@@ -0,0 +1,128 @@
+# Real-World Usage of the Factory Method: rendering notification bodies from precompiled templates
+
+"""
+Notification bodies used to be f-string-formatted at every call site. Here a template is parsed
+once into a render function and every later render reuses it:
+
+    . compile_template() parses "{field}" / "{field:spec}" / "{field!r}" placeholders with
+      string.Formatter, keeps the static fragments as constants, and generates one function
+      that renders with a single "".join. Compiled templates are cached by source.
+    . TemplatedNotificationCreator wraps any NotificationCreator (factory_method.py), so
+      send(context) / send_many(contexts) render the body before the channel sends it.
+"""
+
+from functools import lru_cache
+from string import Formatter
+
+from factory_method import Notification,NotificationCreator
+
+
+class CompiledTemplate:
+
+    def __init__(self,source,render,fields):
+
+        self.source = source
+        self.render = render        # render(context) -> str, context is a mapping
+        self.fields = fields
+
+    def __call__(self,context):
+        return self.render(context)
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.source!r})"
+
+
+@lru_cache(maxsize=1024)
+def compile_template(source):
+
+    parts = []
+    fields = []
+
+    for literal,field,spec,conversion in Formatter().parse(source):
+        if literal:
+            parts.append(repr(literal))
+        if field is None:
+            continue
+        if not field.isidentifier():
+            raise ValueError(f"Template field must be a plain name, got {{{field}}} in {source!r}")
+        if spec and "{" in spec:
+            raise ValueError(f"Nested fields in format specs aren't supported: {source!r}")
+
+        value = f"c[{field!r}]"
+        if conversion == "r":
+            value = f"repr({value})"
+        elif conversion == "a":
+            value = f"ascii({value})"
+        elif conversion == "s":
+            value = f"str({value})"
+
+        parts.append(f"format({value},{spec!r})" if spec else f"str({value})" if conversion is None else value)
+        fields.append(field)
+
+    # Every fragment and field is an element of one tuple literal; the static text is a constant in it
+    code = f"lambda c: ''.join(({', '.join(parts)},))" if parts else "lambda c: ''"
+    render = eval(code,{"__builtins__": {"format": format,"str": str,"repr": repr,"ascii": ascii}})
+    return CompiledTemplate(source,render,tuple(fields))
+
+
+class TemplatedNotification(Notification):
+
+    def __init__(self,notification,template):
+
+        self.notification = notification
+        self.template = template
+
+    def send(self,context):
+        self.notification.send(self.template.render(context))
+
+    def send_batch(self,contexts):
+        render = self.template.render
+        self.notification.send_batch([render(context) for context in contexts])
+
+
+class TemplatedNotificationCreator(NotificationCreator):
+
+    def __init__(self,creator,source):
+
+        self.creator = creator
+        self.template = compile_template(source)
+
+    def create_notification(self):
+        return TemplatedNotification(self.creator.create_notification(),self.template)
+
+
+if __name__ == "__main__":
+
+    import time
+
+    from factory_method import EmailNotificationCreator,SMSNotificationCreator
+
+    welcome = TemplatedNotificationCreator(EmailNotificationCreator(),"Welcome {name}, your plan is {plan!r}")
+    welcome.send({"name": "Mary","plan": "pro"})
+
+    otp = TemplatedNotificationCreator(SMSNotificationCreator(),"{code:06d} is your code, valid {minutes} min")
+    otp.send_many([{"code": 42,"minutes": 5},{"code": 7,"minutes": 5}])
+
+    # Benchmark: 1M personalized messages
+    source = "Hi {name}, your order #{order:08d} of {total:.2f} USD ships {day}. Reply STOP to opt out."
+    contexts = [{"name": f"user{i}","order": i,"total": i * 0.37,"day": "Monday"} for i in range(1_000_000)]
+
+    start = time.perf_counter()
+    for c in contexts:
+        source.format(**c)
+    format_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for c in contexts:
+        f"Hi {c['name']}, your order #{c['order']:08d} of {c['total']:.2f} USD ships {c['day']}. Reply STOP to opt out."
+    fstring_time = time.perf_counter() - start
+
+    render = compile_template(source).render
+    start = time.perf_counter()
+    for c in contexts:
+        render(c)
+    compiled_time = time.perf_counter() - start
+
+    assert render(contexts[123]) == source.format(**contexts[123])
+    print(f"1M renders  str.format: {format_time:.2f}s  f-string at call site: {fstring_time:.2f}s  "
+          f"compiled template: {compiled_time:.2f}s")
@@ -66,6 +66,17 @@ class Enemy(EnemyPrototype):
     def set_health(self,health):
         self.health = health
 
+    def clone_with(self,**overrides):
+
+        enemy = self.clone()
+
+        fields = vars(enemy)    # data fields only, so methods such as clone can't be overwritten
+        for field,value in overrides.items():
+            if field not in fields:
+                raise ValueError(f"Unknown field for {type(self).__name__}: {field}")
+            setattr(enemy,field,value)
+        return enemy
+
     def print_stats(self):
 
         print(f"{self.type} [Health: {self.health}, Speed: {self.speed}, Armored: {self.armored}, Weapon: {self.weapon}]")
@@ -80,19 +91,82 @@ class EnemyRegistry:
 
     def __init__(self):
 
-        self.prototypes = {}
+        self.prototypes = {}    # key -> resolved prototype (flat prototypes live here permanently)
+        self.variants = {}      # key -> (parent_key, overrides)
+        self.dependents = {}    # parent_key -> set of variant keys built directly on it
 
     def register(self,key,prototype):
 
+        self._unlink_variant(key)
         self.prototypes[key] = prototype
+        self._invalidate_dependents(key)
+
+    def register_variant(self,key,parent,**overrides):
+
+        if parent not in self.prototypes and parent not in self.variants:
+            raise ValueError(f"No prototype registered for: {parent}")
+
+        # Walking up from the parent must never reach the variant itself
+        ancestor = parent
+        while ancestor in self.variants:
+            if ancestor == key:
+                raise ValueError(f"Variant {key} would inherit from itself via {parent}")
+            ancestor = self.variants[ancestor][0]
+        if ancestor == key:
+            raise ValueError(f"Variant {key} would inherit from itself via {parent}")
+
+        # Check the overrides now, against the data fields of the prototype at the root of the chain
+        root = self.prototypes[ancestor]
+        unknown = [field for field in overrides if field not in vars(root)]
+        if unknown:
+            raise ValueError(f"Unknown field for {type(root).__name__}: {', '.join(unknown)}")
+
+        self._unlink_variant(key)
+        self.variants[key] = (parent,overrides)
+        self.dependents.setdefault(parent,set()).add(key)
+        self.prototypes.pop(key,None)
+        self._invalidate_dependents(key)
 
     def get(self,key):
 
         prototype = self.prototypes.get(key)
 
-        if prototype is not None:
-            return prototype.clone()
-        raise ValueError(f"No prototype registered for: {key}")
+        if prototype is None:
+            prototype = self._resolve(key)
+        return prototype.clone()
+
+    def _resolve(self,key):
+
+        if key not in self.variants:
+            raise ValueError(f"No prototype registered for: {key}")
+
+        # Collect the unresolved part of the chain, then flatten it top-down
+        chain = []
+        while key not in self.prototypes:
+            chain.append(key)
+            key = self.variants[key][0]
+
+        prototype = self.prototypes[key]
+        for variant_key in reversed(chain):
+            prototype = prototype.clone_with(**self.variants[variant_key][1])
+            self.prototypes[variant_key] = prototype
+        return prototype
+
+    def _unlink_variant(self,key):
+
+        variant = self.variants.pop(key,None)
+
+        if variant is not None:
+            self.dependents[variant[0]].discard(key)
+
+    def _invalidate_dependents(self,key):
+
+        # Only the subtree below the changed key loses its resolved template
+        stack = list(self.dependents.get(key,()))
+        while stack:
+            child = stack.pop()
+            self.prototypes.pop(child,None)
+            stack.extend(self.dependents.get(child,()))
 
 #usage
 
@@ -115,6 +189,17 @@ class Game:
         e2.print_stats()
         e3.print_stats()
 
+        # Variants: a parent prototype plus field overrides, resolved once and cached
+        registry.register_variant("armored_flying","flying",type="ArmoredFlyingEnemy",health=200,armored=True)
+        registry.register_variant("armored_flying_elite","armored_flying",type="EliteArmoredFlyingEnemy",weapon="Plasma")
+
+        registry.get("armored_flying_elite").print_stats()
+
+        # Changing a parent only invalidates the variants built on top of it
+        registry.register("flying",Enemy("FlyingEnemy", 120, 14.0, False, "Laser"))
+        registry.get("armored_flying_elite").print_stats()
+        registry.get("armored").print_stats()
+
 if __name__ == "__main__":
 
    Game.main()